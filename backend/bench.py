@@ -0,0 +1,267 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+# Reproducible benchmarks over the bundled datasets/ CSVs:
+#   startup     load_all_datasets() in a fresh interpreter, parsing the CSVs
+#               (cold) and mapping the snapshot they leave behind (warm)
+#   latency     p50/p99 per representative query, response cache off and
+#               uncompressed, so the numbers are the handlers' own work
+#   throughput  requests/second with concurrent clients over the ASGI app,
+#               or against a running server with --url
+#
+#   python bench.py --save bench_baseline.json
+#   python bench.py --compare bench_baseline.json   # exits 1 on a regression
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(os.path.dirname(BACKEND), "datasets")
+
+NAMES = {
+    "full name": "wasim akram",
+    "short code": "sr tendulkar",
+    "surname": "smith",
+    "single letter": "s",
+}
+
+# /similar refuses names that match many players, so it gets names that
+# resolve to one; no single letter does
+SIMILAR_NAMES = {
+    "full name": "wasim akram",
+    "short code": "sr tendulkar",
+    "surname": "kallis",
+}
+
+# Compression is cached per response in production; with the cache off it
+# would dominate every large body
+PLAIN = {"Accept-Encoding": "identity"}
+
+QUERIES = []
+for kind, name in NAMES.items():
+    QUERIES += [
+        (f"player-profile {kind}", "/player-profile", {"player_name": name}),
+        (f"analyze {kind}", "/analyze", {"player_name": name}),
+        (f"tags {kind}", "/tags", {"player_name": name}),
+    ]
+QUERIES += [(f"similar {kind}", "/similar", {"player_name": name}) for kind, name in SIMILAR_NAMES.items()]
+QUERIES += [("similar t20 only", "/similar", {"player_name": "v kohli", "format": "t20"})]
+QUERIES += [
+    ("player-batch 3 players", "/player-batch", {"names": "sr tendulkar,jh kallis,sk warne"}),
+    ("compare 2 players", "/compare", {"players": "sr tendulkar,rt ponting"}),
+    ("compare 20 players", "/compare", {"players": ",".join([
+        "sr tendulkar", "rt ponting", "bc lara", "jh kallis", "r dravid", "kc sangakkara", "dpmd jayawardene",
+        "sc ganguly", "ms dhoni", "ab de villiers", "v kohli", "sk warne", "m muralitharan", "wasim akram",
+        "a kumble", "sm pollock", "shakib al hasan", "ac gilchrist", "inzamam-ul-haq", "gd mcgrath"])}),
+    ("search prefix", "/search", {"q": "sach"}),
+    ("search typo", "/search", {"q": "tendulkr"}),
+    ("players full list", "/players", {}),
+    ("players prefix page", "/players", {"prefix": "s", "limit": 100}),
+]
+for fmt in ["test", "odi", "t20"]:
+    for role in ["batsman", "bowler", "allrounder", "wk"]:
+        QUERIES.append((f"top-performers {fmt} {role}", "/top-performers", {"format": fmt, "role": role}))
+for team, era, sort_by in [("india", "2000s", "runs"), ("australia", "1990s", "wkts"), ("england", "2010s", None),
+                           ("pakistan", None, "st"), ("south africa", "2000s", None)]:
+    params = {"team": team}
+    if era:
+        params["era"] = era
+    if sort_by:
+        params["sort_by"] = sort_by
+    QUERIES.append((f"player-filter {team} {era or 'all eras'} {sort_by or 'names'}", "/player-filter", params))
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def bench_startup(repeat):
+    # Fresh interpreters so nothing is warm but the OS page cache
+    code = ("import sys, time; sys.path.insert(0, %r); t = time.perf_counter(); import main; "
+            "print(time.perf_counter() - t)" % BACKEND)
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        env = dict(os.environ, CRICKSTATX_DATA_DIR=DATA_DIR, CRICKSTATX_SNAPSHOT_DIR=snapshot_dir)
+        env.pop("CRICKSTATX_RELOAD_INTERVAL", None)
+
+        def load():
+            out = subprocess.run([sys.executable, "-c", code], env=env, check=True,
+                                 capture_output=True, text=True).stdout
+            return float(out.strip().splitlines()[-1]) * 1000
+
+        cold = [load()]
+        warm = [load() for _ in range(repeat)]
+        # Parse every time, with no snapshot at all
+        env["CRICKSTATX_SNAPSHOT_DIR"] = ""
+        parse = [load() for _ in range(repeat)]
+    return {
+        "cold_snapshot_build_ms": round(cold[0], 1),
+        "warm_snapshot_ms": round(min(warm), 1),
+        "csv_parse_ms": round(min(parse), 1),
+    }
+
+
+def load_app():
+    # Every request recomputes its response, so handlers are what is measured
+    os.environ["CRICKSTATX_RESPONSE_CACHE_MB"] = "0"
+    os.environ.setdefault("CRICKSTATX_DATA_DIR", DATA_DIR)
+    os.environ.pop("CRICKSTATX_RELOAD_INTERVAL", None)
+    sys.path.insert(0, BACKEND)
+    import main
+    return main.app
+
+
+def bench_latency(app, iterations):
+    from fastapi.testclient import TestClient
+
+    results = {}
+    with TestClient(app, headers=PLAIN) as client:
+        for label, path, params in QUERIES:
+            # A query that only gets an error or "not found" message back
+            # would time the wrong thing
+            body = client.get(path, params=params).json()
+            if isinstance(body, dict) and ("error" in body or "message" in body):
+                raise RuntimeError(f"{label}: {body}")
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                response = client.get(path, params=params)
+                samples.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{label}: HTTP {response.status_code}")
+            results[label] = {
+                "p50_ms": round(percentile(samples, 50), 3),
+                "p99_ms": round(percentile(samples, 99), 3),
+                "bytes": len(response.content),
+            }
+    return results
+
+
+async def load_generator(client, concurrency, total):
+    # `concurrency` clients issuing the whole query mix until `total` requests are done
+    jobs = iter(range(total))
+    latencies = []
+
+    async def worker():
+        for i in jobs:
+            _, path, params = QUERIES[i % len(QUERIES)]
+            start = time.perf_counter()
+            response = await client.get(path, params=params)
+            latencies.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests_per_s": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+
+def bench_throughput(app, url, levels, total):
+    import httpx
+
+    async def run():
+        results = {}
+        for concurrency in levels:
+            if url:
+                client = httpx.AsyncClient(base_url=url, headers=PLAIN, timeout=120)
+            else:
+                client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=PLAIN)
+            async with client:
+                results[f"{concurrency} clients"] = await load_generator(client, concurrency, total)
+        return results
+
+    return asyncio.run(run())
+
+
+def environment():
+    import numpy
+    import pandas
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def regressions(baseline, current, tolerance, floor_ms):
+    # Slower by more than `tolerance` and by at least `floor_ms`, so noise on
+    # sub-millisecond queries doesn't fail the run
+    found = []
+    for section, key in [("startup", None), ("latency", "p50_ms"), ("throughput", "requests_per_s")]:
+        for label, old in baseline.get(section, {}).items():
+            new = current.get(section, {}).get(label)
+            if new is None:
+                continue
+            if section == "startup":
+                old_v, new_v = old, new
+            else:
+                old_v, new_v = old[key], new[key]
+            if section == "throughput":
+                if new_v < old_v / (1 + tolerance):
+                    found.append(f"{section} {label}: {old_v} -> {new_v} req/s")
+            elif new_v > old_v * (1 + tolerance) and new_v - old_v >= floor_ms:
+                found.append(f"{section} {label}: {old_v} -> {new_v} ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--save", help="Write the results as a JSON baseline")
+    parser.add_argument("--compare", help="Baseline to check the results against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown, as a fraction")
+    parser.add_argument("--floor-ms", type=float, default=1.0, help="Ignore slowdowns smaller than this")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed requests per latency query")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500, help="Requests per throughput level")
+    parser.add_argument("--url", help="Load a running server instead of the in-process app")
+    parser.add_argument("--skip", nargs="*", default=[], choices=["startup", "latency", "throughput"])
+    args = parser.parse_args()
+
+    results = {"environment": environment()}
+    if "startup" not in args.skip:
+        results["startup"] = bench_startup(repeat=3)
+        print("startup", json.dumps(results["startup"]))
+
+    app = load_app() if not args.url or "latency" not in args.skip else None
+    if "latency" not in args.skip:
+        results["latency"] = bench_latency(app, args.iterations)
+        for label, r in results["latency"].items():
+            print(f"{label:<45} p50 {r['p50_ms']:9.3f} ms   p99 {r['p99_ms']:9.3f} ms")
+    if "throughput" not in args.skip:
+        results["throughput"] = bench_throughput(app, args.url, args.concurrency, args.requests)
+        for label, r in results["throughput"].items():
+            print(f"{label:<12} {r['requests_per_s']:8.1f} req/s   p50 {r['p50_ms']:.1f} ms   p99 {r['p99_ms']:.1f} ms")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        found = regressions(baseline, results, args.tolerance, args.floor_ms)
+        for line in found:
+            print("REGRESSION", line)
+        sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
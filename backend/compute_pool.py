@@ -0,0 +1,120 @@
+import asyncio
+import multiprocessing
+import os
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from compression import compress
+from data_state import current_state
+from instrumentation import profiler, recording
+from serialization import encode_json
+
+# Response bodies that miss the cache are computed off the event loop in a
+# fixed-size pool. "thread" shares this process's state; "process" runs them
+# in worker processes that map the same dataset snapshot, so CPU-bound bursts
+# are not serialised by the GIL.
+COMPUTE_POOL = os.environ.get("CRICKSTATX_COMPUTE_POOL", "thread")
+COMPUTE_WORKERS = int(os.environ.get("CRICKSTATX_COMPUTE_WORKERS", "0")) or min(8, os.cpu_count() or 1)
+
+# Set by main: brings a worker process up to the parent's dataset version
+reload_state = None
+
+
+class StaleState(Exception):
+    pass
+
+
+def encoded(state, compute, args):
+    # (body, {phase: seconds}) of compute(state, *args); "compute" excludes
+    # the phases compute() timed itself, such as the name lookup
+    with recording() as timings, profiler.profile(compute.__name__, args):
+        start = time.perf_counter()
+        result = compute(state, *args)
+        computed = time.perf_counter()
+        body = encode_json(result)
+        timings["compute"] = computed - start - sum(timings.values())
+        timings["serialize"] = time.perf_counter() - computed
+    return body, timings
+
+
+def encoded_in_worker(version, compute, args):
+    # Runs in a pool process against that process's own copy of the state
+    if current_state().version != version and reload_state is not None:
+        reload_state()
+    state = current_state()
+    if state.version != version:
+        raise StaleState(f"worker has datasets {state.version}, request needs {version}")
+    return encoded(state, compute, args)
+
+
+class ComputePool:
+    def __init__(self, kind, workers):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"CRICKSTATX_COMPUTE_POOL must be thread or process, not {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.threads = None
+        self.processes = None
+
+    def thread_pool(self):
+        if self.threads is None:
+            self.threads = ThreadPoolExecutor(self.workers, thread_name_prefix="compute")
+        return self.threads
+
+    def process_pool(self):
+        # Started on first use; spawned workers import main and map the snapshot
+        if self.processes is None:
+            self.processes = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.processes
+
+    async def run(self, state, compute, args):
+        # (encoded body, phase timings) of compute(state, *args)
+        loop = asyncio.get_running_loop()
+        if self.kind == "process":
+            try:
+                return await loop.run_in_executor(self.process_pool(), encoded_in_worker, state.version, compute, args)
+            except StaleState:
+                # A reload raced this request; answer it from the state it started on
+                pass
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool next time and answer this one here
+                self.processes = None
+        return await loop.run_in_executor(self.thread_pool(), encoded, state, compute, args)
+
+    async def compress(self, body, encoding):
+        # Off the event loop, like the computation that produced the body
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.thread_pool(), compress, body, encoding)
+
+    def shutdown(self):
+        # Pools are started again on demand if the app is restarted in-process
+        threads, processes = self.threads, self.processes
+        self.threads = self.processes = None
+        if threads is not None:
+            threads.shutdown(wait=False, cancel_futures=True)
+        if processes is not None:
+            processes.shutdown(wait=False, cancel_futures=True)
+
+
+class SingleFlight:
+    # Identical requests in flight at the same time share one computation
+
+    def __init__(self):
+        # Futures belong to one event loop, so calls are tracked per loop
+        self.calls = weakref.WeakKeyDictionary()
+
+    async def do(self, key, start):
+        calls = self.calls.setdefault(asyncio.get_running_loop(), {})
+        future = calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(start())
+            calls[key] = future
+            future.add_done_callback(lambda _: calls.pop(key, None))
+        # A client that disconnects must not cancel the others' result
+        return await asyncio.shield(future)
+
+
+compute_pool = ComputePool(COMPUTE_POOL, COMPUTE_WORKERS)
+single_flight = SingleFlight()
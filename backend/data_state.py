@@ -0,0 +1,79 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Handlers only ever read the shared frames. Copy-on-write makes every
+# selection a lazy copy instead of a view that could write back, and stops
+# df[col] from filling the frame's column cache, so concurrent requests never
+# mutate a shared object.
+pd.set_option("mode.copy_on_write", True)
+
+
+class DataState:
+    # Everything the endpoints read for one version of the CSVs: the typed
+    # datasets and every index, table and leaderboard derived from them.
+    # A state is built completely before it is published and never changed
+    # afterwards; a reload builds a new one and swaps the reference.
+
+    def __init__(self, version, manifest, datasets, name_index, player_store, player_totals, narratives,
+                 stat_populations, similarity_index, leaderboards, filter_index, profile_tables,
+                 player_list, search_index, query_tables, load_timings, memory_bytes):
+        self.version = version
+        self.manifest = manifest
+        self.datasets = datasets
+        self.name_index = name_index
+        self.player_store = player_store
+        self.player_totals = player_totals
+        self.narratives = narratives
+        self.stat_populations = stat_populations
+        self.similarity_index = similarity_index
+        self.leaderboards = leaderboards
+        self.filter_index = filter_index
+        self.profile_tables = profile_tables
+        self.player_list = player_list
+        self.search_index = search_index
+        self.query_tables = query_tables
+        self.load_timings = load_timings
+        self.memory_bytes = memory_bytes
+
+
+def freeze(obj, seen=None):
+    # Marks every numpy array reachable from the indexes read-only, so a
+    # stray in-place write in a handler fails loudly instead of racing
+    seen = set() if seen is None else seen
+    if id(obj) in seen or isinstance(obj, (str, bytes, int, float, pd.DataFrame, pd.Series)):
+        return
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        if obj.dtype != object:
+            obj.setflags(write=False)
+        return
+    if isinstance(obj, dict):
+        for value in obj.values():
+            freeze(value, seen)
+    elif isinstance(obj, (list, tuple)):
+        for value in obj:
+            freeze(value, seen)
+    elif hasattr(obj, "__dict__"):
+        for value in vars(obj).values():
+            freeze(value, seen)
+
+
+_current = None
+
+# Serialises reloads; readers never take it
+reload_lock = threading.Lock()
+
+
+def current_state():
+    # Handlers read this once per request and use that state throughout
+    return _current
+
+
+def publish(state):
+    # Rebinding one reference is atomic, so a request sees the old state or
+    # the new one, never a mix
+    global _current
+    freeze(state)
+    _current = state
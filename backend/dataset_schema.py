@@ -0,0 +1,105 @@
+import pandas as pd
+
+COMMON_COLUMNS = {
+    "Player": "object",
+    "Span": "object",
+    "Mat": "Int64",
+    "Inns": "Int64",
+    "CareerLength": "Int64",
+    "Teams": "object",
+}
+
+# Column dtypes per category after ingestion. Composite text fields (HS, BBI,
+# BBM, MD) are kept for display and also split into numeric parts.
+SCHEMAS = {
+    "Batting": {
+        **COMMON_COLUMNS,
+        "NO": "Int64",
+        "Runs": "Int64",
+        "HS": "object",
+        "HS Runs": "Int64",
+        "HS Not Out": "boolean",
+        "Ave": "Float64",
+        "BF": "Int64",
+        "SR": "Float64",
+        "100": "Int64",
+        "50": "Int64",
+        "0": "Int64",
+        "4s": "Int64",
+        "6s": "Int64",
+    },
+    "Bowling": {
+        **COMMON_COLUMNS,
+        "Balls": "Int64",
+        "Overs": "Float64",
+        "Mdns": "Int64",
+        "Runs": "Int64",
+        "Wkts": "Int64",
+        "BBI": "object",
+        "BBI Wkts": "Int64",
+        "BBI Runs": "Int64",
+        "BBM": "object",
+        "BBM Wkts": "Int64",
+        "BBM Runs": "Int64",
+        "Ave": "Float64",
+        "Econ": "Float64",
+        "SR": "Float64",
+        "4": "Int64",
+        "5": "Int64",
+        "10": "Int64",
+    },
+    "Fielding": {
+        **COMMON_COLUMNS,
+        "Dis": "Int64",
+        "Ct": "Int64",
+        "St": "Int64",
+        "Ct Wk": "Int64",
+        "Ct Fi": "Int64",
+        "MD": "object",
+        "MD Ct": "Int64",
+        "MD St": "Int64",
+        "D/I": "Float64",
+    },
+}
+
+# Composite field -> (pattern, derived columns)
+COMPOSITE_COLUMNS = {
+    "HS": (r"^(\d+)(\*?)$", ["HS Runs", "HS Not Out"]),   # 200*
+    "BBI": (r"^(\d+)/(\d+)$", ["BBI Wkts", "BBI Runs"]),  # 9/51
+    "BBM": (r"^(\d+)/(\d+)$", ["BBM Wkts", "BBM Runs"]),  # 16/220
+    "MD": (r"^\d+ \((\d+)ct (\d+)st\)$", ["MD Ct", "MD St"]),  # 5 (4ct 1st)
+}
+
+DERIVED_COLUMNS = [col for _, cols in COMPOSITE_COLUMNS.values() for col in cols]
+
+
+def split_composites(df):
+    for source, (pattern, columns) in COMPOSITE_COLUMNS.items():
+        if source not in df.columns:
+            continue
+        raw = df[source].astype("string").str.strip()
+        parts = raw.str.extract(pattern)
+        parts.columns = columns
+        if source == "HS":
+            parts["HS Not Out"] = parts["HS Not Out"].map({"*": True, "": False})
+        elif source == "MD":
+            # A bare "0" means no dismissals at all
+            parts[raw.eq("0").fillna(False).to_numpy()] = "0"
+        for col in columns:
+            df[col] = parts[col]
+    return df
+
+
+def apply_schema(category, df):
+    # Coerce every known column of a cleaned dataset to its schema dtype.
+    # Placeholders such as "-" become <NA>.
+    df = split_composites(df)
+    for col, dtype in SCHEMAS.get(category, {}).items():
+        if col not in df.columns or dtype == "object":
+            continue
+        if dtype == "boolean":
+            df[col] = df[col].astype("boolean")
+        else:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(dtype)
+    return df
+
@@ -0,0 +1,122 @@
+import csv
+import io
+import math
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # CSV and NDJSON only
+    pa = pq = None
+
+import numpy as np
+import pandas as pd
+
+from dataset_schema import SCHEMAS
+from serialization import encode_json
+
+# Rows per chunk of an /export stream; a Parquet row group each
+EXPORT_CHUNK = 1000
+
+# output -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Column dtypes of every dataset, for Parquet columns a source doesn't type itself
+COLUMN_TYPES = {column: dtype for schema in SCHEMAS.values() for column, dtype in schema.items()}
+
+if pa is not None:
+    ARROW_TYPES = {"Int64": pa.int64(), "Float64": pa.float64(), "boolean": pa.bool_()}
+
+
+def plain(value):
+    # Python value for a cell; every kind of missing becomes None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or value is pd.NA or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+def csv_chunks(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header of an empty result
+        yield buffer.getvalue().encode("utf-8")
+
+
+def ndjson_chunks(columns, batches):
+    # One JSON object per row
+    for batch in batches:
+        yield b"".join(encode_json(dict(zip(columns, row))) + b"\n" for row in batch)
+
+
+class ChunkSink:
+    # File-like target for ParquetWriter that hands on whatever was written
+    # since the last drain(), so row groups go out as they are finished
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def parquet_chunks(columns, types, batches):
+    fields = [pa.field(c, ARROW_TYPES.get(types.get(c, COLUMN_TYPES.get(c)), pa.string())) for c in columns]
+    schema = pa.schema(fields)
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in batches:
+            values = list(zip(*batch)) if batch else [()] * len(columns)
+            arrays = [
+                pa.array([str(v) if v is not None and pa.types.is_string(f.type) else v for v in column], type=f.type)
+                for column, f in zip(values, fields)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_chunks(output, columns, types, batches):
+    # Encoded chunks of a source's rows; batches are lists of row tuples and
+    # are pulled one at a time, so memory stays at one chunk
+    batches = ([tuple(plain(v) for v in row) for row in batch] for batch in batches)
+    if output == "parquet":
+        return parquet_chunks(columns, types, batches)
+    if output == "ndjson":
+        return ndjson_chunks(columns, batches)
+    return csv_chunks(columns, batches)
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from player_store import dataset_format
+
+# Stats /player-filter can sort by
+STAT_COLUMNS = ["Runs", "Wkts", "St"]
+
+
+def span_years(span):
+    # Start and end year per row, NaN when the span can't be parsed
+    years = span.astype("string").str.strip().str.extract(r"^(\d+)-(\d+)$")
+    return (
+        pd.to_numeric(years[0]).to_numpy(dtype=float, na_value=np.nan),
+        pd.to_numeric(years[1]).to_numpy(dtype=float, na_value=np.nan),
+    )
+
+
+def build_filter_index(datasets, row_ids):
+    # Per dataset: team -> rows, decade -> rows and the sortable stats as
+    # float arrays, so /player-filter only intersects precomputed row sets
+    index = {}
+    for category, files in datasets.items():
+        for filename, df in files.items():
+            if "Teams" not in df.columns or (category, filename) not in row_ids:
+                continue
+
+            teams = {}
+            for pos, value in enumerate(df["Teams"].tolist()):
+                if isinstance(value, str):
+                    for team in value.lower().split(", "):
+                        teams.setdefault(team, []).append(pos)
+
+            if "Span" in df.columns:
+                start, end = span_years(df["Span"])
+            else:
+                start = end = np.full(len(df), np.nan)
+            # Rows without a usable span match every era
+            open_span = np.flatnonzero(np.isnan(start) | np.isnan(end))
+
+            decades = {}
+            if len(open_span) < len(df):
+                first = int(np.nanmin(start)) // 10 * 10
+                for decade in range(first, int(np.nanmax(end)) + 1, 10):
+                    played = np.flatnonzero((start <= decade + 9) & (end >= decade))
+                    decades[decade] = np.union1d(played, open_span)
+
+            index[(category, filename)] = {
+                "format": dataset_format(category, filename),
+                "ids": row_ids[(category, filename)],
+                "teams": {team: np.asarray(rows, dtype=np.intp) for team, rows in teams.items()},
+                "start": start,
+                "end": end,
+                "open_span": open_span,
+                "decades": decades,
+                "stats": {
+                    col: df[col].to_numpy(dtype=float, na_value=np.nan)
+                    for col in STAT_COLUMNS if col in df.columns
+                },
+            }
+    return index
+
+
+def team_rows(entry, team):
+    # Same matching as before: the query is a substring of a team name
+    rows = [r for name, r in entry["teams"].items() if team in name]
+    if not rows:
+        return np.empty(0, dtype=np.intp)
+    return np.unique(np.concatenate(rows))
+
+
+def era_rows(entry, era):
+    try:
+        decade = int(era[:4])  # e.g. "2000s" -> 2000
+    except ValueError:
+        return None
+    if decade in entry["decades"]:
+        return entry["decades"][decade]
+    played = np.flatnonzero((entry["start"] <= decade + 9) & (entry["end"] >= decade))
+    return np.union1d(played, entry["open_span"])
+
+
+def filter_players(index, n_players, team, era=None, format=None, stat=None):
+    # Returns (player IDs, best stat value) ordered for the response: by ID
+    # (alphabetical) without a stat, else by stat descending with ties in the
+    # order players were first met. format is a store format (Test, ODI, T20)
+    seen = []
+    best = np.zeros(n_players)
+
+    for (category, filename), entry in index.items():
+        if format and entry["format"] != format:
+            continue
+
+        rows = team_rows(entry, team)
+        if era:
+            in_era = era_rows(entry, era)
+            if in_era is not None:
+                rows = np.intersect1d(rows, in_era, assume_unique=True)
+
+        ids = entry["ids"][rows]
+        keep = ids >= 0
+        seen.append(ids[keep])
+
+        if stat and category == stat[0] and stat[1] in entry["stats"]:
+            values = entry["stats"][stat[1]][rows]
+            valid = keep & ~np.isnan(values)
+            np.maximum.at(best, ids[valid], values[valid])
+
+    seen = np.concatenate(seen) if seen else np.empty(0, dtype=np.intp)
+    ids, first = np.unique(seen, return_index=True)
+
+    if not stat:
+        return ids, None
+
+    values = best[ids]
+    scored = values > 0
+    ids, first, values = ids[scored], first[scored], values[scored]
+    order = np.lexsort((first, -values))
+    return ids[order], values[order]
@@ -0,0 +1,192 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Upper bounds of the request latency histogram buckets, in seconds
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+
+# Computations slower than this many milliseconds have their sampled stacks
+# written to CRICKSTATX_PROFILE_DIR; 0 leaves the profiler off
+SLOW_REQUEST_MS = float(os.environ.get("CRICKSTATX_SLOW_REQUEST_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.environ.get("CRICKSTATX_PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.environ.get(
+    "CRICKSTATX_PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".profiles")
+)
+
+_local = threading.local()
+
+
+@contextmanager
+def phase(name):
+    # Adds the time spent in the block to `name` for the computation being
+    # recorded on this thread; free when nothing is recording
+    timings = getattr(_local, "timings", None)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+@contextmanager
+def recording():
+    # {phase: seconds} of everything timed with phase() on this thread
+    previous = getattr(_local, "timings", None)
+    _local.timings = timings = {}
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+def server_timing(timings, hit=None):
+    # Server-Timing header value, durations in milliseconds
+    parts = []
+    for name, seconds in timings.items():
+        desc = f';desc="{hit}"' if name == "cache" and hit else ""
+        parts.append(f"{name}{desc};dur={seconds * 1000:.3f}")
+    return ", ".join(parts)
+
+
+def labels(**values):
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in values.items()) + "}"
+
+
+def render_metric(name, kind, help, samples):
+    # One Prometheus text-format metric; samples are (suffix, labels, value)
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{suffix}{label} {value}" for suffix, label, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+class RequestMetrics:
+    # Latency histogram and status counts per (method, route), and the time
+    # each route spends in every phase
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.statuses = Counter()
+        self.phases = defaultdict(float)
+
+    def observe(self, method, route, status, seconds):
+        with self.lock:
+            key = (method, route)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                # Per bucket counts, then total count and sum
+                histogram = self.histograms[key] = [0] * len(self.buckets) + [0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += seconds
+            self.statuses[(method, route, status)] += 1
+
+    def observe_phases(self, route, timings):
+        with self.lock:
+            for name, seconds in timings.items():
+                self.phases[(route, name)] += seconds
+
+    def render(self):
+        with self.lock:
+            histograms = {key: list(h) for key, h in self.histograms.items()}
+            statuses = dict(self.statuses)
+            phases = dict(self.phases)
+
+        latency = []
+        for (method, route), histogram in sorted(histograms.items()):
+            for bound, count in zip(self.buckets, histogram):
+                latency.append(("_bucket", labels(method=method, route=route, le=bound), count))
+            latency.append(("_bucket", labels(method=method, route=route, le="+Inf"), histogram[-2]))
+            latency.append(("_sum", labels(method=method, route=route), round(histogram[-1], 6)))
+            latency.append(("_count", labels(method=method, route=route), histogram[-2]))
+
+        return "".join([
+            render_metric("crickstatx_request_duration_seconds", "histogram",
+                          "Time from request to response headers, per route.", latency),
+            render_metric("crickstatx_requests_total", "counter", "Requests per route and status.", [
+                ("", labels(method=method, route=route, status=status), count)
+                for (method, route, status), count in sorted(statuses.items())
+            ]),
+            render_metric("crickstatx_request_phase_seconds_total", "counter",
+                          "Time spent per route in cache lookup, name lookup, compute and serialize.", [
+                ("", labels(route=route, phase=name), round(seconds, 6))
+                for (route, name), seconds in sorted(phases.items())
+            ]),
+        ])
+
+
+def collapsed_stack(frame):
+    # Root-first "function (file:line);..." as read by flamegraph tools
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SlowRequestProfiler:
+    # One background thread samples the stacks of threads that are inside
+    # profile(); computations slower than the threshold keep their samples
+    # as a collapsed-stack file
+
+    def __init__(self, threshold_ms, interval_ms, folder):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.folder = folder
+        self.active = {}
+        self.lock = threading.Lock()
+        self.sampler = None
+
+    def sample(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, samples in self.active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[collapsed_stack(frame)] += 1
+
+    @contextmanager
+    def profile(self, name, args=()):
+        if not self.threshold:
+            yield
+            return
+        with self.lock:
+            if self.sampler is None:
+                self.sampler = threading.Thread(target=self.sample, name="slow-request-profiler", daemon=True)
+                self.sampler.start()
+            thread_id = threading.get_ident()
+            samples = self.active[thread_id] = Counter()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                del self.active[thread_id]
+            if elapsed >= self.threshold and samples:
+                self.save(name, args, elapsed, samples)
+
+    def save(self, name, args, elapsed, samples):
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            path = os.path.join(self.folder, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{elapsed * 1000:.0f}ms.folded")
+            with open(path, "w") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in samples.most_common())
+        except OSError as e:
+            print(f"Could not write profile for slow {name}: {e}")
+            return
+        print(f"Slow {name}{tuple(args)!r}: {elapsed * 1000:.0f} ms, profile in {path}")
+
+
+request_metrics = RequestMetrics(LATENCY_BUCKETS)
+profiler = SlowRequestProfiler(SLOW_REQUEST_MS, PROFILE_INTERVAL_MS, PROFILE_DIR)
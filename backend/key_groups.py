@@ -0,0 +1,40 @@
+import numpy as np
+
+EMPTY = np.empty(0, dtype=np.intp)
+
+
+class KeyGroups:
+    # Integer values grouped by string key, as three flat arrays: the sorted
+    # distinct keys, where each key's values start, and the values ordered by
+    # key (each group keeps the order the values were given in). Replaces a
+    # dict of small arrays: built with a couple of sorts, and lookups are
+    # binary searches, which also answer prefix queries.
+
+    def __init__(self, keys, values):
+        keys = np.asarray(keys, dtype=str)
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        self.values = np.asarray(values, dtype=np.intp)[order]
+        self.offsets = np.zeros(len(self.keys) + 1, dtype=np.intp)
+        np.cumsum(np.bincount(inverse, minlength=len(self.keys)), out=self.offsets[1:])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def group(self, number):
+        return self.values[self.offsets[number]:self.offsets[number + 1]]
+
+    def number(self, key):
+        # Position of `key` among the distinct keys, or -1
+        i = int(np.searchsorted(self.keys, key))
+        return i if i < len(self.keys) and self.keys[i] == key else -1
+
+    def find(self, key):
+        i = self.number(key)
+        return self.group(i) if i >= 0 else EMPTY
+
+    def prefixed(self, prefix):
+        # Values of every key starting with `prefix`, by key then value order
+        lo = int(np.searchsorted(self.keys, prefix, side="left"))
+        hi = int(np.searchsorted(self.keys, prefix + "\U0010ffff", side="left"))
+        return self.values[self.offsets[lo]:self.offsets[hi]]
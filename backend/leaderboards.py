@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+
+from player_store import DATASET_FILES
+from serialization import CellMatrix
+
+ROLES = ["batsman", "bowler", "allrounder", "wk"]
+
+# /top-performers format parameter -> store format
+FORMAT_KEYS = {"test": "Test", "odi": "ODI", "t20": "T20"}
+
+
+# Columns of each role's board, in order
+ROLE_COLUMNS = {
+    "batsman": ["Player", "Teams", "Mat", "Inns", "Runs", "Ave", "SR", "50", "100", "HS"],
+    "bowler": ["Player", "Teams", "Mat", "Inns", "Wkts", "Econ", "Ave", "SR", "5", "10", "BBI"],
+    "wk": ["Player", "Teams", "Mat", "Runs", "St", "Ct", "D/I", "Ave", "SR", "50", "100", "HS"],
+    "allrounder": ["Player", "Teams", "Runs", "Ave", "SR", "50", "100", "Wkts", "Econ", "5", "10", "HS"],
+}
+
+# Categories each role's ranking reads
+ROLE_CATEGORIES = {
+    "batsman": ["Batting"],
+    "bowler": ["Bowling"],
+    "wk": ["Fielding", "Batting"],
+    "allrounder": ["Batting", "Bowling"],
+}
+
+
+def _dataset(datasets, category, format):
+    return datasets[category][DATASET_FILES[category][FORMAT_KEYS[format]]]
+
+
+def rank_players(datasets, format, role):
+    # Full ranking for one (format, role), best first
+
+    # BATSMAN
+    if role == "batsman":
+        df = _dataset(datasets, "Batting", format)
+        df = df[df["Runs"].notna()]
+
+        sorted_df = df.sort_values(by="Runs", ascending=False)
+
+        cols = [c for c in ROLE_COLUMNS["batsman"] if c in df.columns]
+        return sorted_df[cols]
+
+    # BOWLER
+    if role == "bowler":
+        df = _dataset(datasets, "Bowling", format)
+        df = df[df["Wkts"].notna()]
+
+        sorted_df = df.sort_values(by="Wkts", ascending=False)
+
+        cols = [c for c in ROLE_COLUMNS["bowler"] if c in df.columns]
+        return sorted_df[cols]
+
+    # WK
+    if role == "wk":
+        fld = _dataset(datasets, "Fielding", format)
+        fld = fld[fld["St"].notna()]
+        sorted_fld = fld.sort_values(by=["St", "Dis"], ascending=False)
+
+        bat = _dataset(datasets, "Batting", format)
+        if "Runs" in bat.columns:
+            bat = bat[bat["Runs"].notna()]
+
+        bat_cols = ["Player", "Teams"]
+        for c in ["Runs", "SR", "100", "50", "Ave", "HS", "D/I"]:
+            if c in bat.columns:
+                bat_cols.append(c)
+        bat = bat[bat_cols]
+
+        merged = pd.merge(sorted_fld, bat, on="Player", how="left")
+
+        if "Teams_x" in merged.columns or "Teams_y" in merged.columns:
+            merged["Teams"] = merged.get("Teams_x", "").fillna("")
+            merged.loc[(merged["Teams"] == "") & merged.get("Teams_y").notna(), "Teams"] = merged["Teams_y"]
+            merged.drop(columns=[c for c in ["Teams_x", "Teams_y"] if c in merged.columns], inplace=True)
+
+        cols = [c for c in ROLE_COLUMNS["wk"] if c in merged.columns]
+        return merged[cols]
+
+    # ALLROUNDER
+    batting_df = _dataset(datasets, "Batting", format)
+    bowling_df = _dataset(datasets, "Bowling", format)
+
+    bat_cols = ["Teams","Player", "Runs", "Ave","50","100","HS"]
+    if "SR" in batting_df.columns:
+        bat_cols.append("SR")
+    bat_df = batting_df[bat_cols]
+
+    bowl_cols = ["Player", "Wkts"]
+    if "Econ" in bowling_df.columns:
+        bowl_cols.append("Econ")
+    if "5" in bowling_df.columns:
+        bowl_cols.append("5")
+    if "10" in bowling_df.columns:
+        bowl_cols.append("10")
+    bowl_df = bowling_df[bowl_cols]
+
+    bat_df = bat_df[bat_df["Runs"].notna()]
+    bowl_df = bowl_df[bowl_df["Wkts"].notna()]
+
+    merged = pd.merge(bat_df, bowl_df, on="Player", how="inner").fillna(0)
+    merged = merged[(merged["Runs"] >= 1000) & (merged["Wkts"] >= 50)]
+    merged["Impact"] = merged["Runs"] + merged["Wkts"]
+
+    sorted_df = merged.sort_values(by="Impact", ascending=False)
+
+    cols = [c for c in ROLE_COLUMNS["allrounder"] if c in sorted_df.columns]
+    return sorted_df[cols]
+
+
+def country_of(teams):
+    # Main country of "Teams" (ignore special XI)
+    if not isinstance(teams, str) or not teams:
+        return None
+    teams_list = [t.strip() for t in teams.split(",")]
+    for t in teams_list:
+        if "XI" not in t.upper():
+            return t
+    return teams_list[0]
+
+
+def zero_cells(series, values):
+    # Zero stats are left out of entries, as are "0" texts
+    if series.dtype == object:
+        return np.array([str(v) in ("0", "0.0") for v in values], dtype=bool)
+    return series.eq(0).fillna(False).to_numpy(dtype=bool)
+
+
+class Leaderboard:
+    # One ranked board as a row x column CellMatrix (Player, Country, then
+    # the role's stats) and a mask of the cells each entry shows. Entries are
+    # only turned into dicts for the rows a page asks for.
+
+    def __init__(self, columns, values, shown):
+        self.columns = columns
+        self.values = values
+        self.shown = shown
+
+    def __len__(self):
+        return len(self.values)
+
+    def entries(self, start=0, stop=None):
+        rows = zip(self.values[start:stop].tolist(), self.shown[start:stop].tolist())
+        return [{c: v for c, v, keep in zip(self.columns, cells, shown) if keep} for cells, shown in rows]
+
+    def header(self):
+        # Every column some entry shows: an entry lacks the stats that are zero for it
+        return [c for c, any_shown in zip(self.columns, self.shown.any(axis=0).tolist()) if any_shown] or ["Player"]
+
+
+def build_board(ranked):
+    # Teams becomes Country, right after Player; missing stats are null
+    columns = ["Player", "Country"] + [c for c in ranked.columns if c not in ("Player", "Teams")]
+    cells = []
+    shown = np.ones((len(ranked), len(columns)), dtype=bool)
+    for j, col in enumerate(columns):
+        if col == "Country":
+            values = np.full(len(ranked), None, dtype=object)
+            if "Teams" in ranked.columns:
+                values[:] = [country_of(t) for t in ranked["Teams"].tolist()]
+            # Added only if found
+            shown[:, j] = [bool(v) for v in values]
+        else:
+            series = ranked[col]
+            values = series.to_numpy(dtype=object, na_value=None)
+            shown[:, j] = ~zero_cells(series, values)
+        cells.append(values)
+
+    # Entries with nothing besides the player's name are dropped
+    keep = shown.sum(axis=1) > 1
+    return Leaderboard(columns, CellMatrix(int(keep.sum()), [values[keep] for values in cells]), shown[keep])
+
+
+def build_leaderboards(datasets):
+    # {(format, role): Leaderboard} for every /top-performers combination
+    # Boards whose source CSV is missing or failed to parse are left out
+    leaderboards = {}
+    for format in FORMAT_KEYS:
+        for role in ROLES:
+            sources = [DATASET_FILES[c][FORMAT_KEYS[format]] in datasets.get(c, {}) for c in ROLE_CATEGORIES[role]]
+            if not all(sources):
+                continue
+            leaderboards[(format, role)] = build_board(rank_players(datasets, format, role))
+    return leaderboards
@@ -1,9 +1,35 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Header, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import pandas as pd
+import hmac
 import os
-import json
 import re
+import threading
+import time
+from typing import List
+from player_utils import NameIndex, build_name_index, find_player_rows
+from player_store import DATASET_FORMATS, FORMATS, PlayerStore, build_player_store, build_player_totals
+from similarity import SimilarityIndex, build_similarity_index
+from stat_ranks import COMPARE_STATS, LOWER_IS_BETTER, build_stat_populations, percentile_band, rank_value
+from dataset_schema import SCHEMAS, apply_schema
+from snapshot import (SNAPSHOT_DIR, load_indexes, load_snapshot, object_columns, published_key, save_indexes,
+                      save_snapshot, snapshot_key, snapshot_lock, source_files, source_manifest)
+from leaderboards import FORMAT_KEYS, ROLES, Leaderboard, build_leaderboards
+from filter_index import build_filter_index, filter_players
+from response_cache import cached_response, conditional, response_cache, route_of
+from player_list import PlayerList, build_player_list
+from profiles import build_profile_tables, profile_records
+from search_index import SearchIndex, build_search_index
+from narratives import PlayerNarratives, build_narratives
+from serialization import CellMatrix
+from stats_query import QueryError, QueryTable, build_query_tables, column_types, compile_query
+from compression import compress_stream, negotiate
+from export import EXPORT_CHUNK, EXPORT_FORMATS, export_chunks, pq
+from data_state import DataState, current_state, publish, reload_lock
+from key_groups import KeyGroups
+import compute_pool
+from instrumentation import labels, phase, render_metric, request_metrics
 
 app = FastAPI()
 
@@ -15,9 +41,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-BASE_PATH = "C:/Users/adity/OneDrive/Desktop/CrickStatX/datasets"
+# Folder with the Batting/Bowling/Fielding CSVs; the repo's datasets/ by default
+BASE_PATH = os.environ.get(
+    "CRICKSTATX_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "datasets")
+)
+
+# Seconds between checks of BASE_PATH for changed CSVs; 0 turns the watcher off
+RELOAD_INTERVAL = float(os.environ.get("CRICKSTATX_RELOAD_INTERVAL", "0"))
 
-datasets = {}
+# Seconds between checks of the snapshot for a dataset version another worker
+# loaded; 0 turns following off
+SYNC_INTERVAL = float(os.environ.get("CRICKSTATX_SYNC_INTERVAL", "2"))
+
+# X-Admin-Token expected by POST /admin/reload; the endpoint is disabled when unset
+ADMIN_TOKEN = os.environ.get("CRICKSTATX_ADMIN_TOKEN")
 
 def calculate_career_length(span_str):
     try:
@@ -61,39 +98,252 @@ def extract_teams_played(player_name: str):
 def clean_player_name(player_name):
     return re.sub(r"\s*\(.*?\)", "", player_name).strip()
 
-def load_all_datasets():
-    for category in ["Batting", "Bowling", "Fielding"]:
+CATEGORIES = ["Batting", "Bowling", "Fielding"]
+
+def read_dataset(category, file_path):
+    df = pd.read_csv(file_path)
+
+    # Drop all 'Unnamed' columns
+    df = df.loc[:, ~df.columns.str.startswith('Unnamed')]
+
+    # Drop exact duplicate rows
+    df.drop_duplicates(inplace=True)
+
+    # Add CareerLength
+    if "Span" in df.columns:
+        df["CareerLength"] = df["Span"].apply(calculate_career_length)
+
+    # Extract Teams and Clean Player Name
+    if "Player" in df.columns:
+        df["Teams"] = df["Player"].apply(extract_teams_played)
+        df["Player"] = df["Player"].apply(clean_player_name)
+
+    # Typed stats: "-" placeholders become <NA>, HS/BBI/BBM/MD split into numbers
+    return apply_schema(category, df)
+
+def changed_files(previous, manifest):
+    # Source files added, edited or removed since the previous state
+    if previous is None:
+        return sorted(manifest)
+    old = {rel: entry["sha256"] for rel, entry in previous.manifest.items()}
+    new = {rel: entry["sha256"] for rel, entry in manifest.items()}
+    return sorted(rel for rel in old.keys() | new.keys() if old.get(rel) != new.get(rel))
+
+def parse_all_datasets(previous=None, manifest=None):
+    # On a reload, files whose contents did not change keep their parsed frames
+    changed = set(changed_files(previous, manifest)) if previous is not None else None
+    loaded = {}
+    for category in CATEGORIES:
         category_path = os.path.join(BASE_PATH, category)
-        datasets[category] = {}
+        loaded[category] = {}
         for file in os.listdir(category_path):
             if file.endswith(".csv"):
+                old = previous.datasets.get(category, {}).get(file) if previous is not None else None
+                if old is not None and f"{category}/{file}" not in changed:
+                    loaded[category][file] = old
+                    continue
                 file_path = os.path.join(category_path, file)
                 try:
-                    df = pd.read_csv(file_path)
+                    loaded[category][file] = read_dataset(category, file_path)
+                except Exception as e:
+                    print(f"Error loading {file}: {e}")
+    return loaded
+
+def load_datasets(previous=None):
+    # Map the binary snapshot unless a CSV changed since it was written
+    loaded, manifest = load_snapshot(BASE_PATH, CATEGORIES)
+    if loaded is None:
+        with snapshot_lock():
+            # Another worker may have built it while we waited for the lock
+            loaded, manifest = load_snapshot(BASE_PATH, CATEGORIES)
+            if loaded is None:
+                parsed = parse_all_datasets(previous, manifest)
+                try:
+                    save_snapshot(parsed, manifest)
+                    # Serve from the mapped files too, so this worker shares their pages
+                    loaded, manifest = load_snapshot(BASE_PATH, CATEGORIES)
+                except OSError as e:
+                    print(f"Could not write dataset snapshot: {e}")
+                if loaded is None:
+                    loaded = parsed
+    return loaded, manifest
+
+def frame_memory(df):
+    # Coded text columns count their codes: the snapshot's string table is
+    # shared by all of them
+    return int(df.index.memory_usage()) + sum(
+        df[col].array.codes.nbytes if isinstance(df[col].dtype, pd.CategoricalDtype)
+        else int(df[col].memory_usage(index=False, deep=True))
+        for col in df.columns
+    )
+
+def dataset_memory(datasets):
+    # Bytes per category, strings included; mapped snapshot columns count in full
+    return {
+        category: sum(frame_memory(df) for df in files.values())
+        for category, files in datasets.items()
+    }
 
-                    # Drop all 'Unnamed' columns
-                    df = df.loc[:, ~df.columns.str.startswith('Unnamed')]
+# Classes the stored indexes are made of; no other type is rebuilt on load
+INDEX_CLASSES = [CellMatrix, KeyGroups, Leaderboard, NameIndex, PlayerList, PlayerNarratives, PlayerStore,
+                 QueryTable, SearchIndex, SimilarityIndex]
 
-                    # Drop exact duplicate rows
-                    df.drop_duplicates(inplace=True)
+def build_indexes(datasets, manifest, previous, timed):
+    # Every index is rebuilt from the full datasets: players span all files,
+    # so one changed CSV can move IDs, totals, ranks and leaderboards anywhere
 
-                    # Add CareerLength
-                    if "Span" in df.columns:
-                        df["CareerLength"] = df["Span"].apply(calculate_career_length)
+    # The builders read text as plain object columns; the /query tables keep
+    # the snapshot's coded columns, so their frames stay views of it
+    coded = datasets
+    datasets = timed("object_columns", object_columns, coded)
 
-                    # Extract Teams and Clean Player Name
-                    if "Player" in df.columns:
-                        df["Teams"] = df["Player"].apply(extract_teams_played)
-                        df["Player"] = df["Player"].apply(clean_player_name)
+    # Name lookups for every endpoint are served from this index
+    name_index = timed("name_index", build_name_index, datasets)
 
-                    datasets[category][file] = df
-                except Exception as e:
-                    print(f"Error loading {file}: {e}")
+    # Player-centric view: one row per (player, format) across all categories
+    player_store = timed("player_store", build_player_store, datasets)
+
+    # Career totals, per-format scores and roles per player for /analyze and /tags
+    player_totals = timed("player_totals", build_player_totals, player_store)
+
+    # /player-profile cells with zero stats nulled, plus which ones are non-empty;
+    # tables of unchanged files carry over from the previous state
+    reuse = {}
+    if previous is not None:
+        changed = set(changed_files(previous, manifest))
+        reuse = {key: table for key, table in previous.profile_tables.items() if "/".join(key) not in changed}
+
+    # Team/decade -> rows and sortable stats for /player-filter
+    filter_index = timed("filter_index", build_filter_index, datasets, player_store.row_ids)
+
+    return {
+        "name_index": name_index,
+        "player_store": player_store,
+        "player_totals": player_totals,
+        # Every player's /analyze summary and /tags list, by player ID
+        "narratives": timed("narratives", build_narratives, player_store, player_totals),
+        # Sorted per-format values of every compared stat, for /compare ranks
+        "stat_populations": timed("stat_populations", build_stat_populations, player_store.career),
+        # Percentile feature vectors per player for /similar
+        "similarity_index": timed("similarity_index", build_similarity_index, player_store),
+        # Ranked /top-performers tables for every (format, role)
+        "leaderboards": timed("leaderboards", build_leaderboards, datasets),
+        "filter_index": filter_index,
+        "profile_tables": timed("profile_tables", build_profile_tables, datasets, reuse),
+        # Sorted display names for /players
+        "player_list": timed("player_list", build_player_list, datasets),
+        # Prefix + trigram typeahead over player names and team aliases
+        "search_index": timed("search_index", build_search_index, player_store, TEAM_MAP),
+        # Column arrays of every (category, format) table for /query
+        "query_tables": timed("query_tables", build_query_tables, coded, filter_index),
+    }
+
+def build_state(datasets, manifest, previous=None, load_seconds=0.0):
+    load_timings = {"datasets": load_seconds}
+
+    def timed(step, build, *args):
+        start = time.perf_counter()
+        value = build(*args)
+        load_timings[step] = time.perf_counter() - start
+        return value
+
+    # Cached responses and ETags are tied to this version of the CSVs
+    version = snapshot_key(manifest)
+
+    # The first worker to see a version builds its indexes and stores them
+    # beside the snapshot; the others, and later starts, map them instead
+    with snapshot_lock():
+        indexes = timed("indexes_cached", load_indexes, version, INDEX_CLASSES)
+        if indexes is None:
+            del load_timings["indexes_cached"]
+            indexes = build_indexes(datasets, manifest, previous, timed)
+            save_indexes(version, indexes)
+
+    return DataState(
+        version=version,
+        manifest=manifest,
+        datasets=datasets,
+        **indexes,
+        # Reported on /metrics
+        load_timings=load_timings,
+        memory_bytes=dataset_memory(datasets),
+    )
+
+def load_all_datasets():
+    start = time.perf_counter()
+    loaded, manifest = load_datasets()
+    publish(build_state(loaded, manifest, load_seconds=time.perf_counter() - start))
+
+def reload_datasets():
+    # Re-reads only the CSVs that changed, rebuilds the indexes and swaps the
+    # new state in; requests already running finish on the state they started with
+    with reload_lock:
+        previous = current_state()
+        manifest = source_manifest(BASE_PATH, source_files(BASE_PATH, CATEGORIES), previous.manifest)
+        if snapshot_key(manifest) == previous.version:
+            return {"reloaded": False, "version": previous.version, "changed": []}
+
+        start = time.perf_counter()
+        loaded, manifest = load_datasets(previous)
+        state = build_state(loaded, manifest, previous, load_seconds=time.perf_counter() - start)
+        publish(state)
+        # Entries of the old version can never be served again
+        response_cache.clear()
+        return {"reloaded": True, "version": state.version, "changed": changed_files(previous, manifest)}
+
+def source_signature():
+    # mtime and size per CSV: cheap to poll, hashes are only taken on reload
+    signature = {}
+    for rel in source_files(BASE_PATH, CATEGORIES):
+        try:
+            stat = os.stat(os.path.join(BASE_PATH, rel))
+        except OSError:
+            continue
+        signature[rel] = (stat.st_mtime_ns, stat.st_size)
+    return signature
+
+def watch_datasets():
+    signature = source_signature()
+    while True:
+        time.sleep(RELOAD_INTERVAL)
+        latest = source_signature()
+        if latest == signature:
+            continue
+        signature = latest
+        try:
+            result = reload_datasets()
+            if result["reloaded"]:
+                print(f"Reloaded datasets {result['version']}: {', '.join(result['changed'])}")
+        except Exception as e:
+            # Keep serving the current state; the next change triggers another try
+            print(f"Could not reload datasets: {e}")
+
+def follow_snapshot():
+    # A reload in one uvicorn worker publishes its version as the snapshot's
+    # current key; the other workers load that version too, so they all serve
+    # the same data and ETags
+    while True:
+        time.sleep(SYNC_INTERVAL)
+        key = published_key()
+        if key is None or key == current_state().version:
+            continue
+        try:
+            result = reload_datasets()
+            if result["reloaded"]:
+                print(f"Followed datasets {result['version']}: {', '.join(result['changed'])}")
+        except Exception as e:
+            print(f"Could not follow datasets {key}: {e}")
 
 load_all_datasets()
 
-def to_json(df):
-    return json.loads(df.to_json(orient="records"))
+# Pool worker processes catch up with reloads through the same path
+compute_pool.reload_state = reload_datasets
+
+if RELOAD_INTERVAL > 0:
+    threading.Thread(target=watch_datasets, name="dataset-watcher", daemon=True).start()
+
+if SNAPSHOT_DIR and SYNC_INTERVAL > 0:
+    threading.Thread(target=follow_snapshot, name="snapshot-follower", daemon=True).start()
 
 @app.get("/")
 def home():
@@ -102,7 +352,7 @@ def home():
 @app.get("/available-files")
 def list_files():
     all_files = []
-    for category in ["Batting", "Bowling", "Fielding"]:
+    for category in CATEGORIES:
         folder = os.path.join(BASE_PATH, category)
         if os.path.exists(folder):
             for file in os.listdir(folder):
@@ -110,43 +360,131 @@ def list_files():
                     all_files.append(f"{category}/{file}")
     return {"available_files": all_files}
 
-@app.get("/players")
-def get_all_players():
-    player_set = set()
-    for category_files in datasets.values():
-        for df in category_files.values():
-            if "Player" in df.columns:
-                player_set.update(df["Player"].dropna().str.strip().str.title().unique())
-    return sorted([p for p in player_set if p])
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Latency per route for /metrics, and the total as the last Server-Timing entry
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    request_metrics.observe(request.method, route_of(request), response.status_code, elapsed)
+    response.headers.append("Server-Timing", f"total;dur={elapsed * 1000:.3f}")
+    return response
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text format
+    state = current_state()
+    return PlainTextResponse("".join([
+        request_metrics.render(),
+        render_metric("crickstatx_dataset_load_seconds", "gauge",
+                      "Time spent reading the datasets and building each index at the last (re)load.", [
+            ("", labels(step=step), round(seconds, 6)) for step, seconds in state.load_timings.items()
+        ]),
+        render_metric("crickstatx_dataset_memory_bytes", "gauge", "Memory held by the datasets per category.", [
+            ("", labels(category=category), size) for category, size in state.memory_bytes.items()
+        ]),
+        render_metric("crickstatx_dataset_info", "gauge", "Version of the loaded datasets.", [
+            ("", labels(version=state.version), 1)
+        ]),
+        render_metric("crickstatx_response_cache_bytes", "gauge", "Encoded bodies held by the response cache.", [
+            ("", "", response_cache.size)
+        ]),
+        render_metric("crickstatx_response_cache_entries", "gauge", "Responses held by the response cache.", [
+            ("", "", len(response_cache.entries))
+        ]),
+    ]), media_type="text/plain; version=0.0.4")
+
+@app.on_event("shutdown")
+def stop_compute_pool():
+    compute_pool.compute_pool.shutdown()
+
+@app.post("/admin/reload")
+def admin_reload(x_admin_token: str = Header(None)):
+    # Picks up edited CSVs without a restart
+    if not ADMIN_TOKEN or not hmac.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        return JSONResponse(status_code=403, content={"error": "A valid X-Admin-Token header is required."})
+    return reload_datasets()
+
+@app.get("/schema")
+def get_schema():
+    state = current_state()
+    return {
+        category: {
+            col: dtype for col, dtype in SCHEMAS[category].items()
+            if any(col in df.columns for df in files.values())
+        }
+        for category, files in state.datasets.items()
+    }
 
-@app.get("/player-profile")
-def get_player_profile(player_name: str = Query(..., description="Full name, initials and surname, or just a letter")):
-    player_name = player_name.strip().lower()
+def player_names_page(state, prefix, cursor, limit):
+    try:
+        names, next_cursor = state.player_list.select(prefix, cursor, limit)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    # Without paging parameters the full sorted array, as before
+    if cursor is None and limit is None:
+        return names
+    return {"players": names, "next_cursor": next_cursor}
+
+@app.get("/players")
+async def get_all_players(request: Request,
+                    prefix: str = Query(None, description="Optional: only names starting with this"),
+                    cursor: str = Query(None, description="Optional: next_cursor from the previous page"),
+                    limit: int = Query(None, ge=1, le=5000, description="Optional: page size"),
+                    format: str = Query("json", description="json, or ndjson to stream one name per line")):
+    prefix = prefix.strip() if prefix else None
+    format = format.lower()
+    if format not in ("json", "ndjson"):
+        return {"error": "Invalid format. Choose from json, ndjson"}
+    state = current_state()
+    params = (prefix, cursor, limit)
+    if format == "ndjson":
+        try:
+            names, next_cursor = state.player_list.select(prefix, cursor, limit)
+        except ValueError as e:
+            return {"error": str(e)}
+        headers, not_modified = conditional(request, state.version, ("players.ndjson", params))
+        if not_modified:
+            return not_modified
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        chunks = state.player_list.ndjson_chunks(names)
+        encoding = negotiate(request.headers.get("accept-encoding"))
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            chunks = compress_stream(chunks, encoding)
+        return StreamingResponse(chunks, media_type="application/x-ndjson", headers=headers)
+
+    return await cached_response(request, state, "players", params, player_names_page, *params)
+
+def search_suggestions(state, query, limit):
+    players, teams = state.search_index.search(query, limit)
+    return {"query": query, "players": players, "teams": teams}
+
+@app.get("/search")
+async def search_players(request: Request,
+                   q: str = Query(..., description="Part of a player name or team, typos allowed"),
+                   limit: int = Query(10, ge=1, le=50, description="Number of suggestions")):
+    query = " ".join(q.lower().split())
+    return await cached_response(request, current_state(), "search", (query, limit), search_suggestions, query, limit)
+
+def resolve_player(state, player_name):
+    # Matched rows per dataset and the distinct players behind them
+    with phase("lookup"):
+        matches = find_player_rows(state.name_index, player_name)
+        return matches, state.player_store.ids_for_rows(matches)
+
+def player_profile(state, player_name, matches):
     result = {}
 
-    for category, files in datasets.items():
+    for category, files in state.datasets.items():
         result[category] = {}
-        for filename, df in files.items():
-            if "Player" in df.columns:
-                df["lower_name"] = df["Player"].str.lower()
-                df["surname"] = df["Player"].apply(lambda x: x.lower().split()[-1] if isinstance(x, str) else "")
-                df["short_code"] = df["Player"].apply(
-                    lambda x: f"{x.strip().split()[0][0].lower()} {x.lower().split()[-1]}"
-                    if isinstance(x, str) and len(x.strip().split()) >= 2 else "")
-                df["initial"] = df["Player"].apply(lambda x: x.strip()[0].lower() if isinstance(x, str) else "")
-
-                if " " in player_name:
-                    matched_df = df[(df["short_code"] == player_name) | (df["lower_name"] == player_name)]
-                elif len(player_name) == 1:
-                    matched_df = df[df["initial"] == player_name]
-                else:
-                    matched_df = df[df["surname"] == player_name]
-
-                if not matched_df.empty:
-                    cleaned = matched_df.drop(columns=["lower_name", "surname", "short_code", "initial"])
-                    # Remove any columns with all 0 values
-                    cleaned = cleaned.applymap(lambda x: None if str(x).isdigit() and int(x) == 0 else x).dropna(axis=1, how="all")
-                    result[category][filename] = to_json(cleaned)
+        for filename in files:
+            positions = matches.get((category, filename))
+            if positions is not None:
+                # Zero stats are nulled at load; columns empty for every match are dropped
+                result[category][filename] = profile_records(state.profile_tables[(category, filename)], positions)
 
     if all(len(files) == 0 for files in result.values()):
         return {"message": f"No data found for player: {player_name.title()}"}
@@ -156,317 +494,128 @@ def get_player_profile(player_name: str = Query(..., description="Full name, ini
         "profile": result
     }
 
+def profile_of(state, player_name):
+    with phase("lookup"):
+        matches = find_player_rows(state.name_index, player_name)
+    return player_profile(state, player_name, matches)
 
-@app.get("/analyze")
-def analyze_player(player_name: str = Query(..., description="Search by full name, short form like 's tendulkar', or just 's'")):
+@app.get("/player-profile")
+async def get_player_profile(request: Request, player_name: str = Query(..., description="Full name, initials and surname, or just a letter")):
     player_name = player_name.strip().lower()
-    summary_by_player = {}
-
-    for category, files in datasets.items():
-        for filename, df in files.items():
-            if "Player" not in df.columns:
-                continue
-
-            df["lower_name"] = df["Player"].str.lower()
-            df["surname"] = df["Player"].apply(lambda x: x.lower().split()[-1] if isinstance(x, str) else "")
-            df["short_code"] = df["Player"].apply(
-                lambda x: f"{x.strip().split()[0][0].lower()} {x.lower().split()[-1]}"
-                if isinstance(x, str) and len(x.strip().split()) >= 2 else ""
-            )
-            df["initial"] = df["Player"].apply(lambda x: x.strip()[0].lower() if isinstance(x, str) else "")
-
-            if " " in player_name:
-                matched_df = df[(df["short_code"] == player_name) | (df["lower_name"] == player_name)]
-            elif len(player_name) == 1:
-                matched_df = df[df["initial"] == player_name]
-            else:
-                matched_df = df[df["surname"] == player_name]
-
-            for _, row in matched_df.iterrows():
-                player = row["Player"]
-                if player not in summary_by_player:
-                    summary_by_player[player] = {
-                        "Batting": [],
-                        "Bowling": [],
-                        "Fielding": [],
-                        "CareerLength": row.get("CareerLength"),
-                        "Teams": row.get("Teams"),
-                    }
-                summary_by_player[player][category].append(dict(row))
-
-    if not summary_by_player:
-        return {"message": f"No player found for '{player_name}'"}
+    return await cached_response(request, current_state(), "player-profile", player_name, profile_of, player_name)
 
-    final_output = []
-
-    for player, sections in summary_by_player.items():
-        batting, bowling, fielding = sections.get("Batting", []), sections.get("Bowling", []), sections.get("Fielding", [])
-        teams = sections.get("Teams", "N/A")
-        career = sections.get("CareerLength", "N/A")
-
-        def valid(val): return str(val).isdigit() and int(val) > 0
-
-        total_runs = sum(int(r["Runs"]) for r in batting if valid(r.get("Runs")))
-        total_4s = sum(int(r["4s"]) for r in batting if valid(r.get("4s")))
-        total_6s = sum(int(r["6s"]) for r in batting if valid(r.get("6s")))
-        innings = sum(int(r["Inns"]) for r in batting if valid(r.get("Inns")))
-
-        total_wickets = sum(int(r["Wkts"]) for r in bowling if valid(r.get("Wkts")))
-        four_wkts = sum(int(r["4"]) for r in bowling if valid(r.get("4")))
-        five_wkts = sum(int(r["5"]) for r in bowling if valid(r.get("5")))
-        ten_wkts = sum(int(r["10"]) for r in bowling if valid(r.get("10")))
-
-        total_dismissals = sum(int(r["Dis"]) for r in fielding if valid(r.get("Dis")))
-        total_catches = sum(int(r["Ct"]) for r in fielding if valid(r.get("Ct")))
-        total_stumpings = sum(int(r["St"]) for r in fielding if valid(r.get("St")))
-
-        is_batsman = total_runs > 1000 and total_wickets < 50
-        is_bowler = total_wickets > 100 and total_runs < 1000
-        is_allrounder = total_runs > 1000 and total_wickets > 50
-
-        lines = [f"{player} represented {teams} for {career} years in international cricket across various formats."]
-
-        if is_batsman:
-            line = f"🏏 A remarkable batsman, he"
-            if total_runs: line += f" scored over {total_runs} runs"
-            if innings: line += f" in {innings} innings"
-            line += "."
-            if total_4s: line += f" He struck {total_4s} boundaries"
-            if total_6s: line += f" and {total_6s} sixes"
-            line += ". His consistency made him a pillar in his batting lineup."
-            lines.append(line)
-
-        elif is_bowler:
-            line = f"🔥 A lethal bowler, he"
-            if total_wickets: line += f" claimed over {total_wickets} wickets"
-            if four_wkts: line += f" with {four_wkts} four-wicket hauls"
-            if five_wkts: line += f", {five_wkts} five-wicket hauls"
-            if ten_wkts: line += f", and {ten_wkts} ten-wicket hauls"
-            line += ". His economy and average made him a threat for batters."
-            lines.append(line)
-
-        elif is_allrounder:
-            line = f"⭐ An excellent all-rounder, he"
-            if total_runs: line += f" accumulated {total_runs} runs"
-            if total_wickets: line += f" and took {total_wickets} wickets"
-            haul_parts = []
-            if four_wkts: haul_parts.append(f"{four_wkts} four-wicket hauls")
-            if five_wkts: haul_parts.append(f"{five_wkts} five-wicket hauls")
-            if ten_wkts: haul_parts.append(f"{ten_wkts} ten-wicket match hauls")
-            if haul_parts:
-                line += ". His bowling included " + ", ".join(haul_parts) + "."
-            line += " His performance in both departments contributed equally to his team's success."
-            lines.append(line)
 
-        else:
-            lines.append("While his numbers aren't exceptional in batting or bowling alone, his utility as a team player was valuable.")
+def player_summaries(state, player_name, player_ids):
+    if not player_ids:
+        return {"message": f"No player found for '{player_name}'"}
 
-        if fielding:
-            if total_stumpings > 0:
-                lines.append(f"🧤 His fielding record includes {total_dismissals} dismissals, {total_catches} catches and {total_stumpings} stumpings.")
-            elif total_catches > 0:
-                lines.append(f"⚡ In the field, he contributed {total_catches} catches, showcasing his alertness.")
+    # Summaries are written at load; this only gathers the matched ones
+    names = state.player_store.names[player_ids].tolist()
+    summaries = state.narratives.summaries[player_ids].tolist()
+    return [{"player": player, "summary": summary} for player, summary in zip(names, summaries)]
 
-        final_output.append({
-            "player": player,
-            "summary": " ".join(lines)
-        })
+def summaries_of(state, player_name):
+    return player_summaries(state, player_name, resolve_player(state, player_name)[1])
 
-    return final_output
-
-@app.get("/tags")
-def generate_tags(player_name: str = Query(..., description="Search by full name, initials + surname, surname, or just a letter")):
+@app.get("/analyze")
+async def analyze_player(request: Request, player_name: str = Query(..., description="Search by full name, short form like 's tendulkar', or just 's'")):
     player_name = player_name.strip().lower()
-    tags_by_player = {}
-
-    for category, files in datasets.items():
-        for filename, df in files.items():
-            if "Player" not in df.columns:
-                continue
-
-            # Create helper columns
-            df["lower_name"] = df["Player"].str.lower()
-            df["surname"] = df["Player"].apply(lambda x: x.lower().split()[-1] if isinstance(x, str) else "")
-            df["short_code"] = df["Player"].apply(
-                lambda x: f"{x.strip().split()[0][0].lower()} {x.lower().split()[-1]}"
-                if isinstance(x, str) and len(x.strip().split()) >= 2 else "")
-            df["initial"] = df["Player"].apply(lambda x: x.strip()[0].lower() if isinstance(x, str) else "")
-
-            # Matching logic
-            if " " in player_name:
-                matched_df = df[(df["short_code"] == player_name) | (df["lower_name"] == player_name)]
-            elif len(player_name) == 1:
-                matched_df = df[df["initial"] == player_name]
-            else:
-                matched_df = df[df["surname"] == player_name]
-
-            # Collect data by player
-            for _, row in matched_df.iterrows():
-                player = row["Player"]
-                if player not in tags_by_player:
-                    tags_by_player[player] = {
-                        "Batting": [],
-                        "Bowling": [],
-                        "Fielding": [],
-                        "FormatScores": {"Test": 0, "ODI": 0, "T20": 0}
-                    }
-
-                # Organize data by category
-                if category == "Batting":
-                    tags_by_player[player]["Batting"].append(row)
-                elif category == "Bowling":
-                    tags_by_player[player]["Bowling"].append(row)
-                elif category == "Fielding":
-                    tags_by_player[player]["Fielding"].append(row)
-
-                # Format name for performance comparison
-                format_key = ""
-                if "test" in filename.lower():
-                    format_key = "Test"
-                elif "odi" in filename.lower():
-                    format_key = "ODI"
-                elif "t20" in filename.lower():
-                    format_key = "T20"
-                else:
-                    continue
+    return await cached_response(request, current_state(), "analyze", player_name, summaries_of, player_name)
 
-                # Add performance score to format
-                def valid(val): return str(val).replace(".", "", 1).isdigit() and float(val) > 0
-                score = 0
-                if category == "Batting" and valid(row.get("Runs")):
-                    score += int(row["Runs"])
-                if category == "Bowling" and valid(row.get("Wkts")):
-                    score += int(row["Wkts"]) * 20
-                if category == "Fielding" and valid(row.get("Dis")):
-                    score += int(row["Dis"]) * 10
-
-                tags_by_player[player]["FormatScores"][format_key] += score
-
-    if not tags_by_player:
+def player_tags(state, player_name, player_ids):
+    if not player_ids:
         return {"message": f"No player found for '{player_name}'"}
 
-    # Generate tags per player
-    final_tags = []
-
-    for player, data in tags_by_player.items():
-        batting = data["Batting"]
-        bowling = data["Bowling"]
-        fielding = data["Fielding"]
-        format_scores = data["FormatScores"]
-
-        # Totals
-        def valid(val): return str(val).replace(".", "", 1).isdigit() and float(val) > 0
-        total_runs = sum(int(r["Runs"]) for r in batting if valid(r.get("Runs")))
-        total_wkts = sum(int(r["Wkts"]) for r in bowling if valid(r.get("Wkts")))
-        total_stumps = sum(int(r["St"]) for r in fielding if valid(r.get("St")))
-
-        # Role Tag
-        if total_stumps > 1:
-            role_tag = " Wicketkeeper Batter 🧤"
-        elif total_runs > 1000 and total_wkts >= 50:
-            role_tag = " Spirited All-Rounder ⚔️"
-        elif total_runs > 1000:
-            role_tag = " Dependable Batsman 🏏"
-        elif total_wkts >= 100:
-            role_tag = " Ferocious Bowler 🎯"
-        else:
-            role_tag = "Versatile Team Player 🔁"
-
-        # Format Tag (best performing format)
-        best_format = max(format_scores.items(), key=lambda x: x[1])[0]
-        format_tag = (
-            "Test Veteran 🛡️" if best_format == "Test" else
-            "ODI Performer 🔥" if best_format == "ODI" else
-            "T20 Specialist 💪"
-        )
+    # Role and best-format tags are materialized per player at load
+    names = state.player_store.names[player_ids].tolist()
+    tags = state.narratives.tags[player_ids].tolist()
+    return [{"player": player, "tags": tag_list} for player, tag_list in zip(names, tags)]
 
+def tags_of(state, player_name):
+    return player_tags(state, player_name, resolve_player(state, player_name)[1])
 
-        tags = []
-        if role_tag:
-            tags.append(role_tag)
-        tags.append(format_tag)
-
-        final_tags.append({
-            "player": player,
-            "tags": tags
-        })
-
-    return final_tags
-
-@app.get("/compare")
-def compare_players(players: str = Query(..., description="Comma-separated list of TWO player names or short codes")):
-    player_names = [p.strip().lower() for p in players.split(",") if p.strip()]
-    if len(player_names) != 2:
-        return {"error": "Please provide exactly TWO players for comparison."}
-
-    comparison_data = {}
-
-    def valid(val):
-        return str(val).replace(".", "", 1).isdigit() and float(val) > 0
-
-    # Process datasets
-    for category, files in datasets.items():
-        for filename, df in files.items():
-            if "Player" not in df.columns:
-                continue
-
-            # Prepare search helpers
-            df["lower_name"] = df["Player"].str.lower()
-            df["surname"] = df["Player"].apply(lambda x: x.lower().split()[-1] if isinstance(x, str) else "")
-            df["short_code"] = df["Player"].apply(
-                lambda x: f"{x.strip().split()[0][0].lower()} {x.lower().split()[-1]}"
-                if isinstance(x, str) and len(x.strip().split()) >= 2 else ""
-            )
-            df["initial"] = df["Player"].apply(lambda x: x.strip()[0].lower() if isinstance(x, str) else "")
-
-            # Detect format
-            if "test" in filename.lower():
-                fmt = "Test"
-            elif "odi" in filename.lower():
-                fmt = "ODI"
-            elif "t20" in filename.lower():
-                fmt = "T20"
-            else:
-                continue
-
-            for pname in player_names:
-                if " " in pname:
-                    matched_df = df[(df["short_code"] == pname) | (df["lower_name"] == pname)]
-                elif len(pname) == 1:
-                    matched_df = df[df["initial"] == pname]
-                else:
-                    matched_df = df[df["surname"] == pname]
-
-                for _, row in matched_df.iterrows():
-                    player = row["Player"]
-                    if player not in comparison_data:
-                        comparison_data[player] = {
-                            "Batting": {}, "Bowling": {}, "Fielding": {}
-                        }
-
-                    if category == "Batting":
-                        if fmt not in comparison_data[player]["Batting"]:
-                            comparison_data[player]["Batting"][fmt] = {}
-                        for col in ["Mat", "Inns", "Runs", "Ave", "SR", "100", "50", "4s", "6s"]:
-                            if col in row and valid(row[col]):
-                                comparison_data[player]["Batting"][fmt][col] = row[col]
-
-                    elif category == "Bowling":
-                        if fmt not in comparison_data[player]["Bowling"]:
-                            comparison_data[player]["Bowling"][fmt] = {}
-                        for col in ["Mat", "Inns", "Wkts", "Econ", "Ave", "SR", "4", "5", "10"]:
-                            if col in row and valid(row[col]):
-                                comparison_data[player]["Bowling"][fmt][col] = row[col]
-
-                    elif category == "Fielding":
-                        if fmt not in comparison_data[player]["Fielding"]:
-                            comparison_data[player]["Fielding"][fmt] = {}
-                        for col in ["Mat", "Inns", "Dis", "Ct", "St"]:
-                            if col in row and valid(row[col]):
-                                comparison_data[player]["Fielding"][fmt][col] = row[col]
-
-    if not comparison_data:
+@app.get("/tags")
+async def generate_tags(request: Request, player_name: str = Query(..., description="Search by full name, initials + surname, surname, or just a letter")):
+    player_name = player_name.strip().lower()
+    return await cached_response(request, current_state(), "tags", player_name, tags_of, player_name)
+
+PLAYER_FACETS = ["profile", "summary", "tags"]
+MAX_BATCH_PLAYERS = 200
+
+def player_batch(state, player_names, facets):
+    # Each name is matched once and every requested facet reuses the match
+    results = []
+    for player_name in player_names:
+        matches, player_ids = resolve_player(state, player_name)
+        entry = {"query": player_name}
+        if "profile" in facets:
+            entry["profile"] = player_profile(state, player_name, matches)
+        if "summary" in facets:
+            entry["summary"] = player_summaries(state, player_name, player_ids)
+        if "tags" in facets:
+            entry["tags"] = player_tags(state, player_name, player_ids)
+        results.append(entry)
+    return {"facets": list(facets), "players": results}
+
+@app.get("/player-batch")
+async def get_player_batch(request: Request,
+                     names: List[str] = Query(..., description="Player names; repeat the parameter or separate with commas"),
+                     facets: str = Query("profile,summary,tags", description="Comma-separated: profile, summary, tags")):
+    # Same name forms as /player-profile, /analyze and /tags, one round trip
+    player_names = []
+    for value in names:
+        for name in value.split(","):
+            name = name.strip().lower()
+            if name and name not in player_names:
+                player_names.append(name)
+    requested = {f.strip().lower() for f in facets.split(",") if f.strip()}
+
+    if not player_names:
+        return {"error": "Please provide at least one player name."}
+    if len(player_names) > MAX_BATCH_PLAYERS:
+        return {"error": f"Please request at most {MAX_BATCH_PLAYERS} players at a time."}
+    if not requested or not requested <= set(PLAYER_FACETS):
+        return {"error": "Invalid facets. Choose from profile, summary, tags"}
+
+    # Facets always come back in PLAYER_FACETS order
+    params = (tuple(player_names), tuple(f for f in PLAYER_FACETS if f in requested))
+    return await cached_response(request, current_state(), "player-batch", params, player_batch, *params)
+
+MAX_COMPARE_PLAYERS = 20
+
+def compare(state, player_names):
+    if not 2 <= len(player_names) <= MAX_COMPARE_PLAYERS:
+        return {"error": f"Please provide between 2 and {MAX_COMPARE_PLAYERS} players for comparison."}
+
+    with phase("lookup"):
+        name_matches = [find_player_rows(state.name_index, pname) for pname in player_names]
+        player_ids = state.player_store.ids_for_rows(*name_matches)
+
+    if not player_ids:
         return {"message": "No matching players found."}
+    if len(player_ids) < 2:
+        return {"message": "Need at least two matching players to compare."}
+    if len(player_ids) > MAX_COMPARE_PLAYERS:
+        return {"error": f"These names match {len(player_ids)} players; narrow them down to at most {MAX_COMPARE_PLAYERS}."}
+
+    def total(player, category, stat):
+        return sum(stats.get(stat, 0) for stats in comparison_data[player][category].values())
+
+    # Every matched player's career stats per category and format, in one batch
+    names = state.player_store.names[player_ids].tolist()
+    name_of = dict(zip(player_ids, names))
+    comparison_data = {player: {"Batting": {}, "Bowling": {}, "Fielding": {}} for player in names}
+    rows = state.player_store.careers_of(player_ids)
+
+    for category, stats in COMPARE_STATS.items():
+        if (category, "Mat") not in rows.columns:
+            continue
+        section = rows.loc[rows[(category, "Mat")].notna(), category]
+        cols = [c for c in stats if c in section.columns]
+        for (player_id, fmt), values in section[cols].to_dict(orient="index").items():
+            comparison_data[name_of[player_id]][category][fmt] = {
+                col: v for col, v in values.items() if not pd.isna(v) and v > 0
+            }
 
     final_comparison = {
         "players": list(comparison_data.keys()),
@@ -475,24 +624,14 @@ def compare_players(players: str = Query(..., description="Comma-separated list
     }
 
     # Detect WK logic
-    both_wk = True
-    for p in comparison_data:
-        st_sum = sum(int(v) for fmt in comparison_data[p]["Fielding"].values() for k, v in fmt.items() if k == "St" and valid(v))
-        if st_sum == 0:
-            both_wk = False
-            break
+    all_wk = all(total(p, "Fielding", "St") > 0 for p in comparison_data)
 
     # Ct & Dis display control
     show_ct = True
     show_dis = True
-    if not both_wk:
-        p1_ct = sum(int(v) for fmt in comparison_data[list(comparison_data.keys())[0]]["Fielding"].values() for k, v in fmt.items() if k == "Ct" and valid(v))
-        p1_dis = sum(int(v) for fmt in comparison_data[list(comparison_data.keys())[0]]["Fielding"].values() for k, v in fmt.items() if k == "Dis" and valid(v))
-        p2_ct = sum(int(v) for fmt in comparison_data[list(comparison_data.keys())[1]]["Fielding"].values() for k, v in fmt.items() if k == "Ct" and valid(v))
-        p2_dis = sum(int(v) for fmt in comparison_data[list(comparison_data.keys())[1]]["Fielding"].values() for k, v in fmt.items() if k == "Dis" and valid(v))
-
-        if p1_ct == p1_dis and p2_ct == p2_dis:
-            # Only show Dis if Ct & Dis are equal for both players
+    if not all_wk:
+        if all(total(p, "Fielding", "Ct") == total(p, "Fielding", "Dis") for p in comparison_data):
+            # Only show Dis if Ct & Dis are equal for every player
             show_ct = False
             show_dis = True
 
@@ -504,8 +643,8 @@ def compare_players(players: str = Query(..., description="Comma-separated list
                 if fmt in comparison_data[player][role]:
                     stats_set.update(comparison_data[player][role][fmt].keys())
 
-            for stat in stats_set:
-                if stat == "St" and not both_wk:
+            for stat in [s for s in COMPARE_STATS[role] if s in stats_set]:
+                if stat == "St" and not all_wk:
                     continue
                 if stat == "Ct" and not show_ct:
                     continue
@@ -521,13 +660,13 @@ def compare_players(players: str = Query(..., description="Comma-separated list
     # Winner calculation
     player_scores = {p: 0 for p in comparison_data}
     player_roles = {}
-    for player, pdata in comparison_data.items():
-        runs = sum(int(v) for fmt in pdata["Batting"].values() for k, v in fmt.items() if k == "Runs" and valid(v))
-        wkts = sum(int(v) for fmt in pdata["Bowling"].values() for k, v in fmt.items() if k == "Wkts" and valid(v))
-        dismissals = sum(int(v) for fmt in pdata["Fielding"].values() for k, v in fmt.items() if k in ["Dis", "Ct", "St"] and valid(v))
+    for player in comparison_data:
+        runs = total(player, "Batting", "Runs")
+        wkts = total(player, "Bowling", "Wkts")
+        dismissals = sum(total(player, "Fielding", stat) for stat in ["Dis", "Ct", "St"])
 
         # Assign role
-        if sum(int(v) for fmt in pdata["Fielding"].values() for k, v in fmt.items() if k == "St" and valid(v)) > 0:
+        if total(player, "Fielding", "St") > 0:
             player_roles[player] = "wk"
         elif runs > 1000 and wkts >= 50:
             player_roles[player] = "allrounder"
@@ -539,13 +678,14 @@ def compare_players(players: str = Query(..., description="Comma-separated list
         player_scores[player] = runs + (wkts * 20) + (dismissals * 10)
 
     winner = max(player_scores.items(), key=lambda x: x[1])[0]
-    loser = [p for p in player_scores if p != winner][0]
+    # With more than two players the runner-up stands in for the other side
+    loser = max(((p, s) for p, s in player_scores.items() if p != winner), key=lambda x: x[1])[0]
 
     # Winner stats
-    winner_runs = sum(int(v) for fmt in comparison_data[winner]["Batting"].values() for k, v in fmt.items() if k == "Runs" and valid(v))
-    winner_wkts = sum(int(v) for fmt in comparison_data[winner]["Bowling"].values() for k, v in fmt.items() if k == "Wkts" and valid(v))
-    winner_stumps = sum(int(v) for fmt in comparison_data[winner]["Fielding"].values() for k, v in fmt.items() if k == "St" and valid(v))
-    winner_catches = sum(int(v) for fmt in comparison_data[winner]["Fielding"].values() for k, v in fmt.items() if k == "Ct" and valid(v))
+    winner_runs = total(winner, "Batting", "Runs")
+    winner_wkts = total(winner, "Bowling", "Wkts")
+    winner_stumps = total(winner, "Fielding", "St")
+    winner_catches = total(winner, "Fielding", "Ct")
 
     # Winner summary (unchanged from your given one, with emojis)
     if player_roles[winner] == "wk":
@@ -577,237 +717,354 @@ def compare_players(players: str = Query(..., description="Comma-separated list
         "summary": summary_text
     }
 
+    # Players x stats matrix with rank and percentile across everyone who played the format
+    columns = [
+        (category, fmt, stat)
+        for category, stats in COMPARE_STATS.items()
+        for fmt in FORMATS
+        for stat in stats
+        if any(stat in comparison_data[p][category].get(fmt, {}) for p in comparison_data)
+    ]
+    matrix = {"columns": [list(c) for c in columns], "rows": names, "scores": [player_scores[p] for p in names],
+              "values": [], "ranks": [], "percentiles": [], "bands": []}
+    for player in names:
+        values, ranks, percentiles, bands = [], [], [], []
+        for category, fmt, stat in columns:
+            value = comparison_data[player][category].get(fmt, {}).get(stat)
+            rank, percentile = rank_value(state.stat_populations.get((category, fmt, stat), []), value,
+                                          (category, stat) in LOWER_IS_BETTER)
+            values.append(value)
+            ranks.append(rank)
+            percentiles.append(percentile)
+            bands.append(percentile_band(percentile) if percentile is not None else None)
+        matrix["values"].append(values)
+        matrix["ranks"].append(ranks)
+        matrix["percentiles"].append(percentiles)
+        matrix["bands"].append(bands)
+    final_comparison["matrix"] = matrix
+
     return final_comparison
 
+@app.get("/compare")
+async def compare_players(request: Request, players: str = Query(..., description="Comma-separated list of 2 to 20 player names or short codes")):
+    player_names = tuple(p.strip().lower() for p in players.split(",") if p.strip())
+    return await cached_response(request, current_state(), "compare", player_names, compare, player_names)
+
+def similar_players(state, player_name, k, format):
+    player_ids = resolve_player(state, player_name)[1]
+    if not player_ids:
+        return {"message": f"No player found for '{player_name}'"}
+    if len(player_ids) > MAX_COMPARE_PLAYERS:
+        return {"error": f"'{player_name}' matches {len(player_ids)} players; narrow it down to at most {MAX_COMPARE_PLAYERS}."}
+
+    names = state.player_store.names
+    teams = state.player_store.teams
+    index = state.similarity_index
+    no_stats = f"No {format} stats for this player" if format else "No stats for this player"
+    max_distance = index.max_distance(format)
+    if max_distance == 0:
+        return {"message": f"No {format} stats to compare" if format else "No stats to compare"}
+    if not any(index.has_stats(player_id, format) for player_id in player_ids):
+        return {"message": no_stats}
+
+    results = []
+    for player_id in player_ids:
+        if not index.has_stats(player_id, format):
+            results.append({"player": names[player_id], "similar": [], "message": no_stats})
+            continue
+        nearest, distances = index.nearest(player_id, k, format)
+        results.append({
+            "player": names[player_id],
+            "similar": [
+                {
+                    "player": names[i],
+                    "teams": teams[i] if isinstance(teams[i], str) else None,
+                    "similarity": round(float(1 - d / max_distance), 3),
+                }
+                for i, d in zip(nearest.tolist(), distances.tolist())
+            ],
+        })
+    return results
+
+@app.get("/similar")
+async def get_similar_players(request: Request,
+                        player_name: str = Query(..., description="Same name forms as /analyze"),
+                        k: int = Query(10, ge=1, le=50, description="Number of similar players"),
+                        format: str = Query(None, description="Optional: compare on one format only (test, odi, t20)")):
+    player_name = player_name.strip().lower()
+    if format is not None:
+        format = format.lower()
+        if format not in FORMAT_KEYS:
+            return {"error": "Invalid format. Choose from test, odi, t20"}
+    fmt = FORMAT_KEYS.get(format)
+    params = (player_name, k, fmt)
+    return await cached_response(request, current_state(), "similar", params, similar_players, *params)
+
+def top_performers_page(state, format, role, limit, offset):
+    board = state.leaderboards.get((format, role))
+    if board is None:
+        return {"error": f"No {role} rankings for {format}: its dataset is not loaded"}
+    return {"role": role, "format": format, "top_performers": board.entries(offset, offset + limit)}
+
 @app.get("/top-performers")
-def top_performers(format: str = Query(..., description="Format: test, odi, t20"),
+async def top_performers(request: Request,
+                   format: str = Query(..., description="Format: test, odi, t20"),
                    role: str = Query(..., description="Role: batsman, bowler, allrounder, wk"),
-                   limit: int = Query(10, description="Number of players to return")):
+                   limit: int = Query(10, ge=0, description="Number of players to return"),
+                   offset: int = Query(0, ge=0, description="Number of ranked players to skip")):
     format = format.lower()
     role = role.lower()
-    
-    # Map role to dataset
-    if role == "batsman":
-        file_map = {"test": "Batting/test.csv", "odi": "Batting/ODI data.csv", "t20": "Batting/t20.csv"}
-    elif role == "bowler":
-        file_map = {"test": "Bowling/Bowling_test.csv", "odi": "Bowling/Bowling_ODI.csv", "t20": "Bowling/Bowling_t20.csv"}
-    elif role == "wk":
-        file_map = {"test": "Fielding/Fielding_test.csv", "odi": "Fielding/Fielding_ODI.csv", "t20": "Fielding/Fielding_t20.csv"}
-    elif role == "allrounder":
-        file_map = {
-            "test": ("Batting/test.csv", "Bowling/Bowling_test.csv"),
-            "odi": ("Batting/ODI data.csv", "Bowling/Bowling_ODI.csv"),
-            "t20": ("Batting/t20.csv", "Bowling/Bowling_t20.csv")
-        }
-    else:
+
+    if role not in ROLES:
         return {"error": "Invalid role. Choose from batsman, bowler, allrounder, wk"}
+    if format not in FORMAT_KEYS:
+        return {"error": "Invalid format. Choose from test, odi, t20"}
+
+    # Rankings are built at load time; each page is encoded once
+    params = (format, role, limit, offset)
+    return await cached_response(request, current_state(), "top-performers", params, top_performers_page, *params)
+
+# sort_by -> (category, column, response key)
+FILTER_STATS = {
+    "runs": ("Batting", "Runs", "Runs"),
+    "wkts": ("Bowling", "Wkts", "Wickets"),
+    "st": ("Fielding", "St", "Stumpings"),
+}
 
-    result = []
+def filtered_players(state, team, sort_by, era, format):
+    if sort_by and sort_by not in FILTER_STATS:
+        return {"error": "Invalid sort_by. Choose from runs, wkts, st"}
+    if format and format.lower() not in FORMAT_KEYS:
+        return {"error": "Invalid format. Choose from test, odi, t20"}
+    stat = FILTER_STATS[sort_by] if sort_by else None
+    fmt = FORMAT_KEYS[format.lower()] if format else None
+
+    # Team and era filters are intersections of precomputed row sets
+    player_ids, values = filter_players(state.filter_index, len(state.player_store.players), team, era, fmt, stat)
+    names = state.player_store.names[player_ids]
+
+    if stat:
+        # Highest first, only players with a non-zero stat
+        result = [{"Player": name, stat[2]: int(value)} for name, value in zip(names, values)]
+    else:
+        # Alphabetical player names only (IDs follow name order)
+        result = [{"Player": name} for name in names]
 
-    # BATSMAN 
-    if role == "batsman":
-        file = file_map[format]
-        df = datasets["Batting"][file.split("/")[-1]].copy()
-
-        df = df[df["Runs"].apply(lambda x: str(x).isdigit())]
-        df["Runs"] = df["Runs"].astype(int)
-
-        sorted_df = df.sort_values(by="Runs", ascending=False).head(limit)
-
-        cols = [c for c in ["Player","Teams","Mat", "Inns", "Runs", "Ave", "SR", "50", "100", "HS"] if c in df.columns]
-        result = sorted_df[cols].to_dict(orient="records")
-
-    # BOWLER
-    elif role == "bowler":
-        file = file_map[format]
-        df = datasets["Bowling"][file.split("/")[-1]].copy()
-
-        df = df[df["Wkts"].apply(lambda x: str(x).isdigit())]
-        df["Wkts"] = df["Wkts"].astype(int)
-
-        sorted_df = df.sort_values(by="Wkts", ascending=False).head(limit)
-
-        cols = [c for c in ["Player","Teams","Mat", "Inns", "Wkts", "Econ", "Ave", "SR", "5", "10" ,"BBI"] if c in df.columns]
-        result = sorted_df[cols].to_dict(orient="records")
-
-    # WK 
-    elif role == "wk":
-        file = file_map[format]
-        fld = datasets["Fielding"][file.split("/")[-1]].copy()
-        fld = fld[fld["St"].apply(lambda x: str(x).isdigit())].copy()
-        fld["St"] = fld["St"].astype(int)
-        if "Dis" in fld.columns:
-            fld["Dis"] = fld["Dis"].astype(int)
-        sorted_fld = fld.sort_values(by=["St", "Dis"], ascending=False).head(limit)
-
-        bat_file = {"test": "Batting/test.csv", "odi": "Batting/ODI data.csv", "t20": "Batting/t20.csv"}[format]
-        bat = datasets["Batting"][bat_file.split("/")[-1]].copy()
-        if "Runs" in bat.columns:
-            bat = bat[bat["Runs"].apply(lambda x: str(x).isdigit())].copy()
-            bat["Runs"] = bat["Runs"].astype(int)
-
-        bat_cols = ["Player", "Teams"]
-        for c in ["Runs", "SR", "100", "50", "Ave", "HS", "D/I"]:
-            if c in bat.columns:
-                bat_cols.append(c)
-        bat = bat[bat_cols]
-
-        merged = pd.merge(sorted_fld, bat, on="Player", how="left")
-
-        if "Teams_x" in merged.columns or "Teams_y" in merged.columns:
-            merged["Teams"] = merged.get("Teams_x", "").fillna("")
-            merged.loc[(merged["Teams"] == "") & merged.get("Teams_y").notna(), "Teams"] = merged["Teams_y"]
-            merged.drop(columns=[c for c in ["Teams_x", "Teams_y"] if c in merged.columns], inplace=True)
-
-        cols = [c for c in ["Player", "Teams", "Mat", "Runs", "St", "Ct", "D/I", "Ave", "SR", "50", "100", "HS"] if c in merged.columns]
-        result = merged[cols].to_dict(orient="records")
-
-    # ALLROUNDER 
-    elif role == "allrounder":
-        bat_file, bowl_file = file_map[format]
-        batting_df = datasets["Batting"][bat_file.split("/")[-1]].copy()
-        bowling_df = datasets["Bowling"][bowl_file.split("/")[-1]].copy()
-
-        bat_cols = ["Teams","Player", "Runs", "Ave","50","100","HS"]
-        if "SR" in batting_df.columns:
-            bat_cols.append("SR")
-        bat_df = batting_df[bat_cols]
-
-        bowl_cols = ["Player", "Wkts"]
-        if "Econ" in bowling_df.columns:
-            bowl_cols.append("Econ")
-        if "5" in bowling_df.columns:
-            bowl_cols.append("5")
-        if "10" in bowling_df.columns:
-            bowl_cols.append("10")
-        bowl_df = bowling_df[bowl_cols]
-
-        bat_df = bat_df[bat_df["Runs"].apply(lambda x: str(x).isdigit())].copy()
-        bowl_df = bowl_df[bowl_df["Wkts"].apply(lambda x: str(x).isdigit())].copy()
-
-        bat_df["Runs"] = bat_df["Runs"].astype(int)
-        bowl_df["Wkts"] = bowl_df["Wkts"].astype(int)
-
-        merged = pd.merge(bat_df, bowl_df, on="Player", how="inner").fillna(0)
-        merged = merged[(merged["Runs"] >= 1000) & (merged["Wkts"] >= 50)]
-        merged["Impact"] = merged["Runs"] + merged["Wkts"]
-
-        sorted_df = merged.sort_values(by="Impact", ascending=False).head(limit)
-
-        cols = [c for c in ["Player","Teams","Runs","Ave","SR","50","100","Wkts","Econ","5","10","HS"] if c in sorted_df.columns]
-        result = sorted_df[cols].to_dict(orient="records")
-
-    # Fix Teams → Country and place it right after Player
-    final_result = []
-    for r in result:
-        new_r = {}
-        if "Player" in r:
-            new_r["Player"] = r["Player"]
-
-        # Extract main country (ignore special XI)
-        country = None
-        if "Teams" in r and r["Teams"]:
-            teams_list = [t.strip() for t in r["Teams"].split(",")]
-            for t in teams_list:
-                if "XI" not in t.upper():
-                    country = t
-                    break
-            if not country and teams_list:
-                country = teams_list[0]
-
-        # Add country only if found
-        if country:
-            new_r["Country"] = country
-
-        # Add the rest (skipping Teams)
-        for k, v in r.items():
-            if k not in ["Player", "Teams"]:
-                new_r[k] = v
-
-        # Remove zero values
-        new_r = {k: v for k, v in new_r.items() if str(v) not in ["0", "0.0"]}
-        if len(new_r) > 1:
-            final_result.append(new_r)
-
-    return {"role": role, "format": format, "top_performers": final_result}
+    # Build response with proper order (team → era → format → players)
+    response = {"team": team.capitalize()}
+    if era:
+        response["era"] = era
+    if format:
+        response["format"] = format.lower()
+    response["players"] = result  # always added last
+
+    return response
 
 @app.get("/player-filter")
-def player_filter(
+async def player_filter(
+    request: Request,
     team: str = Query(..., description="Country name (e.g., India, Australia, Pakistan)"),
     sort_by: str = Query(None, description="Optional: 'runs', 'wkts', 'st'"),
     era: str = Query(None, description="Optional: decade like 1990s, 2000s, 2010s"),
     format: str = Query(None, description="Optional: 'test', 'odi', 't20'")
 ):
     team = team.strip().lower()
-    players = {}
+    params = (team, sort_by, era, format)
+    return await cached_response(request, current_state(), "player-filter", params, filtered_players, *params)
 
-    # 🔹 Helper: check if player played in given era
-    def in_era(span, era):
-        if not era or not isinstance(span, str) or "-" not in span:
-            return True
-        try:
-            start, end = map(int, span.split("-"))
-            decade = int(era[:4])  # e.g. "2000s" -> 2000
-            return (start <= decade + 9 and end >= decade)
-        except:
-            return True
-
-    # Loop through datasets
-    for category in datasets:
-        for file, df in datasets[category].items():
-            if "Teams" not in df.columns:
-                continue
-
-            # Apply format filter
-            if format and format.lower() not in file.lower():
-                continue
-
-            # Filter by team
-            mask = df["Teams"].apply(lambda x: isinstance(x, str) and team in x.lower())
-            filtered = df[mask].copy()
-
-            # Apply era filter
-            if "Span" in filtered.columns and era:
-                filtered = filtered[filtered["Span"].apply(lambda s: in_era(s, era))]
-
-            for _, row in filtered.iterrows():
-                name = row["Player"]
-                if name not in players:
-                    players[name] = {"Player": name}
-
-                # Assign stats only if sort_by is requested
-                if sort_by == "runs" and category == "Batting" and "Runs" in row and str(row["Runs"]).isdigit():
-                    players[name]["Runs"] = max(players[name].get("Runs", 0), int(row["Runs"]))
-                elif sort_by == "wkts" and category == "Bowling" and "Wkts" in row and str(row["Wkts"]).isdigit():
-                    players[name]["Wickets"] = max(players[name].get("Wickets", 0), int(row["Wkts"]))
-                elif sort_by == "st" and category == "Fielding" and "St" in row and str(row["St"]).isdigit():
-                    players[name]["Stumpings"] = max(players[name].get("Stumpings", 0), int(row["St"]))
-
-    result = list(players.values())
-
-    # Sorting by stat if requested
-    if sort_by:
-        stat_key = {"runs": "Runs", "wkts": "Wickets", "st": "Stumpings"}[sort_by]
-        result = sorted(result, key=lambda x: x.get(stat_key, 0), reverse=True)
-
-        # Keep only Player and that stat + remove 0 values
-        cleaned = []
-        for r in result:
-            if r.get(stat_key, 0) > 0:  # remove irrelevant 0 stat players
-                new_r = {"Player": r["Player"]}
-                new_r[stat_key] = r[stat_key]
-                cleaned.append(new_r)
-        result = cleaned
-    else:
-        # Alphabetical player names only
-        result = sorted([{"Player": r["Player"]} for r in result], key=lambda x: x["Player"])
+# Rows a single /query may return
+QUERY_MAX_LIMIT = 1000
 
-    # Build response with proper order (team → era → format → players)
-    response = {"team": team.capitalize()}
-    if era:
-        response["era"] = era
-    if format:
-        response["format"] = format.lower()
-    response["players"] = result  # always added last
+def stats_query(state, category, fmt, where, sort, fields, limit, offset):
+    try:
+        plan = compile_query(category, where, sort, fields)
+    except QueryError as e:
+        return {"error": str(e)}
+
+    table = state.query_tables.get((category, fmt))
+    if table is None:
+        return {"error": f"No {category.lower()} data for {fmt}: its dataset is not loaded"}
+    with phase("query"):
+        total, results = table.run(plan, limit, offset)
+    return {
+        "category": category,
+        "format": fmt,
+        "total": total,
+        "fields": plan.fields,
+        "results": results,
+    }
+
+@app.get("/query")
+async def query_stats(
+    request: Request,
+    category: str = Query(..., description="Category: batting, bowling, fielding"),
+    format: str = Query(..., description="Format: test, odi, t20"),
+    where: str = Query(None, description="Filter, e.g. Runs > 5000 and (SR >= 85 or Debut >= 2000)"),
+    sort: str = Query(None, description="Comma-separated columns, '-' for descending, e.g. -Ave,Runs"),
+    fields: str = Query(None, description="Comma-separated columns to return"),
+    limit: int = Query(50, ge=0, le=QUERY_MAX_LIMIT, description="Number of rows to return"),
+    offset: int = Query(0, ge=0, description="Number of matching rows to skip"),
+):
+    category = category.strip().capitalize()
+    format = format.lower()
+    if category not in SCHEMAS:
+        return {"error": "Invalid category. Choose from batting, bowling, fielding"}
+    if format not in FORMAT_KEYS:
+        return {"error": "Invalid format. Choose from test, odi, t20"}
+
+    # Plans are compiled once per distinct query and shared across reloads
+    params = (category, FORMAT_KEYS[format], where, sort, fields, limit, offset)
+    return await cached_response(request, current_state(), "query", params, stats_query, *params)
+
+# Each export source returns (columns, {column: dtype}, batches of row tuples)
+# or an error dict; the batches are produced lazily, chunk by chunk
+
+def profile_export(state, player_name):
+    matches = find_player_rows(state.name_index, player_name)
+    parts = [
+        (category, DATASET_FORMATS[category][filename], state.profile_tables[(category, filename)], positions)
+        for category, files in state.datasets.items()
+        for filename in files
+        if (positions := matches.get((category, filename))) is not None
+    ]
+    if not parts:
+        return {"error": f"No data found for player: {player_name.title()}"}
+
+    # One row per matched dataset row; categories share columns by name
+    columns = ["Category", "Format"] + list(dict.fromkeys(c for _, _, (cols, _, _), _ in parts for c in cols))
+    slot = {c: i for i, c in enumerate(columns)}
+
+    def batches():
+        for category, fmt, (cols, values, _), positions in parts:
+            slots = [slot[c] for c in cols]
+            for i in range(0, len(positions), EXPORT_CHUNK):
+                batch = []
+                for cells in values[positions[i:i + EXPORT_CHUNK]].tolist():
+                    row = [category, fmt] + [None] * (len(columns) - 2)
+                    for j, value in zip(slots, cells):
+                        row[j] = value
+                    batch.append(tuple(row))
+                yield batch
+
+    return columns, {}, batches()
+
+def leaderboard_export(state, format, role):
+    board = state.leaderboards.get((format, role))
+    if board is None:
+        return {"error": f"No {role} rankings for {format}: its dataset is not loaded"}
+    # Stats an entry leaves out are zero for that player and exported empty
+    columns = board.header()
+
+    def batches():
+        for i in range(0, len(board), EXPORT_CHUNK):
+            yield [tuple(e.get(c) for c in columns) for e in board.entries(i, i + EXPORT_CHUNK)]
+
+    return columns, {"Country": "object"}, batches()
+
+def filter_export(state, team, sort_by, era, format):
+    if sort_by and sort_by not in FILTER_STATS:
+        return {"error": "Invalid sort_by. Choose from runs, wkts, st"}
+    if format and format.lower() not in FORMAT_KEYS:
+        return {"error": "Invalid format. Choose from test, odi, t20"}
+    stat = FILTER_STATS[sort_by] if sort_by else None
+    fmt = FORMAT_KEYS[format.lower()] if format else None
+    columns = ["Player", stat[2]] if stat else ["Player"]
+
+    def batches():
+        player_ids, values = filter_players(state.filter_index, len(state.player_store.players), team, era, fmt, stat)
+        names = state.player_store.names
+        for i in range(0, len(player_ids), EXPORT_CHUNK):
+            chunk = names[player_ids[i:i + EXPORT_CHUNK]].tolist()
+            if stat:
+                yield list(zip(chunk, values[i:i + EXPORT_CHUNK].astype(int).tolist()))
+            else:
+                yield [(name,) for name in chunk]
+
+    return columns, {stat[2]: "Int64"} if stat else {}, batches()
 
-    return response
\ No newline at end of file
+def query_export(state, category, fmt, where, sort, fields):
+    try:
+        plan = compile_query(category, where, sort, fields)
+    except QueryError as e:
+        return {"error": str(e)}
+    table = state.query_tables.get((category, fmt))
+    if table is None:
+        return {"error": f"No {category.lower()} data for {fmt}: its dataset is not loaded"}
+
+    def batches():
+        _, rows = table.select(plan)
+        for i in range(0, len(rows), EXPORT_CHUNK):
+            yield list(zip(*table.values(plan.fields, rows[i:i + EXPORT_CHUNK])))
+
+    return plan.fields, column_types(category), batches()
+
+@app.get("/export")
+async def export(
+    request: Request,
+    source: str = Query(..., description="profile, top-performers, player-filter or query"),
+    output: str = Query("csv", description="csv, ndjson or parquet"),
+    player_name: str = Query(None, description="profile: player to export"),
+    format: str = Query(None, description="top-performers, query: test, odi, t20; player-filter: optional format"),
+    role: str = Query(None, description="top-performers: batsman, bowler, allrounder, wk"),
+    team: str = Query(None, description="player-filter: country name"),
+    sort_by: str = Query(None, description="player-filter: optional 'runs', 'wkts', 'st'"),
+    era: str = Query(None, description="player-filter: optional decade like 1990s"),
+    category: str = Query(None, description="query: batting, bowling, fielding"),
+    where: str = Query(None, description="query: filter"),
+    sort: str = Query(None, description="query: sort columns"),
+    fields: str = Query(None, description="query: columns to export"),
+):
+    source = source.lower()
+    output = output.lower()
+    if output not in EXPORT_FORMATS:
+        return {"error": "Invalid output. Choose from csv, ndjson, parquet"}
+    if output == "parquet" and pq is None:
+        return {"error": "Parquet export needs pyarrow (pip install pyarrow)"}
+
+    state = current_state()
+    if source == "profile":
+        if not player_name:
+            return {"error": "player_name is required for a profile export"}
+        params = (player_name,)
+        exported = profile_export(state, player_name)
+    elif source == "top-performers":
+        format = (format or "").lower()
+        role = (role or "").lower()
+        if role not in ROLES:
+            return {"error": "Invalid role. Choose from batsman, bowler, allrounder, wk"}
+        if format not in FORMAT_KEYS:
+            return {"error": "Invalid format. Choose from test, odi, t20"}
+        params = (format, role)
+        exported = leaderboard_export(state, format, role)
+    elif source == "player-filter":
+        if not team:
+            return {"error": "team is required for a player-filter export"}
+        params = (team.strip().lower(), sort_by, era, format)
+        exported = filter_export(state, *params)
+    elif source == "query":
+        category = (category or "").strip().capitalize()
+        format = (format or "").lower()
+        if category not in SCHEMAS:
+            return {"error": "Invalid category. Choose from batting, bowling, fielding"}
+        if format not in FORMAT_KEYS:
+            return {"error": "Invalid format. Choose from test, odi, t20"}
+        params = (category, FORMAT_KEYS[format], where, sort, fields)
+        exported = query_export(state, *params)
+    else:
+        return {"error": "Invalid source. Choose from profile, top-performers, player-filter, query"}
+    if isinstance(exported, dict):
+        return exported
+
+    headers, not_modified = conditional(request, state.version, ("export", source, output, params))
+    if not_modified:
+        return not_modified
+    media_type, extension = EXPORT_FORMATS[output]
+    headers["Content-Disposition"] = f'attachment; filename="crickstatx-{source}.{extension}"'
+
+    # Rows are encoded as the client reads them, one chunk at a time
+    chunks = export_chunks(output, *exported)
+    encoding = negotiate(request.headers.get("accept-encoding")) if output != "parquet" else None
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        chunks = compress_stream(chunks, encoding)
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
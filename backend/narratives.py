@@ -0,0 +1,107 @@
+import numpy as np
+
+ROLE_TAGS = {
+    "wk": " Wicketkeeper Batter 🧤",
+    "allrounder": " Spirited All-Rounder ⚔️",
+    "batsman": " Dependable Batsman 🏏",
+    "bowler": " Ferocious Bowler 🎯",
+    None: "Versatile Team Player 🔁",
+}
+
+
+def summary_text(player, teams, career, t):
+    total_runs, total_4s, total_6s, innings = t["runs"], t["fours"], t["sixes"], t["innings"]
+    total_wickets, four_wkts, five_wkts, ten_wkts = t["wickets"], t["four_wkts"], t["five_wkts"], t["ten_wkts"]
+    total_dismissals, total_catches, total_stumpings = t["dismissals"], t["catches"], t["stumpings"]
+
+    is_batsman = t["summary_role"] == "batsman"
+    is_bowler = t["summary_role"] == "bowler"
+    is_allrounder = t["summary_role"] == "allrounder"
+
+    lines = [f"{player} represented {teams} for {career} years in international cricket across various formats."]
+
+    if is_batsman:
+        line = f"🏏 A remarkable batsman, he"
+        if total_runs: line += f" scored over {total_runs} runs"
+        if innings: line += f" in {innings} innings"
+        line += "."
+        if total_4s: line += f" He struck {total_4s} boundaries"
+        if total_6s: line += f" and {total_6s} sixes"
+        line += ". His consistency made him a pillar in his batting lineup."
+        lines.append(line)
+
+    elif is_bowler:
+        line = f"🔥 A lethal bowler, he"
+        if total_wickets: line += f" claimed over {total_wickets} wickets"
+        if four_wkts: line += f" with {four_wkts} four-wicket hauls"
+        if five_wkts: line += f", {five_wkts} five-wicket hauls"
+        if ten_wkts: line += f", and {ten_wkts} ten-wicket hauls"
+        line += ". His economy and average made him a threat for batters."
+        lines.append(line)
+
+    elif is_allrounder:
+        line = f"⭐ An excellent all-rounder, he"
+        if total_runs: line += f" accumulated {total_runs} runs"
+        if total_wickets: line += f" and took {total_wickets} wickets"
+        haul_parts = []
+        if four_wkts: haul_parts.append(f"{four_wkts} four-wicket hauls")
+        if five_wkts: haul_parts.append(f"{five_wkts} five-wicket hauls")
+        if ten_wkts: haul_parts.append(f"{ten_wkts} ten-wicket match hauls")
+        if haul_parts:
+            line += ". His bowling included " + ", ".join(haul_parts) + "."
+        line += " His performance in both departments contributed equally to his team's success."
+        lines.append(line)
+
+    else:
+        lines.append("While his numbers aren't exceptional in batting or bowling alone, his utility as a team player was valuable.")
+
+    if t["fielded"]:
+        if total_stumpings > 0:
+            lines.append(f"🧤 His fielding record includes {total_dismissals} dismissals, {total_catches} catches and {total_stumpings} stumpings.")
+        elif total_catches > 0:
+            lines.append(f"⚡ In the field, he contributed {total_catches} catches, showcasing his alertness.")
+
+    return " ".join(lines)
+
+
+def tag_list(t):
+    # Role Tag
+    role_tag = ROLE_TAGS[t["role"]]
+
+    # Format Tag (best performing format)
+    best_format = t["best_format"]
+    format_tag = (
+        "Test Veteran 🛡️" if best_format == "Test" else
+        "ODI Performer 🔥" if best_format == "ODI" else
+        "T20 Specialist 💪"
+    )
+
+    tags = []
+    if role_tag:
+        tags.append(role_tag)
+    tags.append(format_tag)
+    return tags
+
+
+class PlayerNarratives:
+    # The /analyze summary and /tags list of every player, indexed by player
+    # ID. Both depend only on career data, so they are written once per load
+    # and a query matching hundreds of players just gathers them.
+
+    def __init__(self, summaries, tags):
+        self.summaries = summaries
+        self.tags = tags
+
+
+def build_narratives(player_store, player_totals):
+    info = player_store.players[["Player", "Teams", "CareerLength"]]
+    totals = player_totals.to_dict(orient="records")
+
+    summaries = []
+    tags = np.empty(len(totals), dtype=object)
+    for player_id, ((player, teams, career), t) in enumerate(zip(info.itertuples(index=False), totals)):
+        summaries.append(summary_text(player, teams, career, t))
+        tags[player_id] = tag_list(t)
+    # Fixed-width text, so a snapshot can map the summaries instead of
+    # holding them as objects in every worker
+    return PlayerNarratives(np.array(summaries, dtype=str), tags)
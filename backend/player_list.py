@@ -0,0 +1,59 @@
+import base64
+import binascii
+import bisect
+
+import numpy as np
+
+from serialization import encode_json
+
+# Names per NDJSON chunk when /players is streamed
+STREAM_CHUNK = 1000
+
+
+def encode_cursor(name):
+    return base64.urlsafe_b64encode(name.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    # Cursors are the last name of the previous page, so they survive reloads
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return base64.b64decode(padded, altchars=b"-_", validate=True).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+class PlayerList:
+    # Sorted, de-duplicated display names served by /players
+
+    def __init__(self, names):
+        self.names = names
+        self.lower = np.array([n.lower() for n in names], dtype=str)
+
+    def select(self, prefix=None, cursor=None, limit=None):
+        # (names, next cursor or None) after the cursor, optionally by prefix
+        start = bisect.bisect_right(self.names, decode_cursor(cursor)) if cursor else 0
+        if prefix:
+            positions = np.flatnonzero(np.char.startswith(self.lower[start:], prefix.lower())) + start
+        else:
+            positions = np.arange(start, len(self.names))
+
+        more = limit is not None and len(positions) > limit
+        if limit is not None:
+            positions = positions[:limit]
+        names = [self.names[i] for i in positions.tolist()]
+        return names, (encode_cursor(names[-1]) if more else None)
+
+    def ndjson_chunks(self, names):
+        # One JSON string per line
+        for i in range(0, len(names), STREAM_CHUNK):
+            yield b"".join(encode_json(name) + b"\n" for name in names[i:i + STREAM_CHUNK])
+
+
+def build_player_list(datasets):
+    player_set = set()
+    for category_files in datasets.values():
+        for df in category_files.values():
+            if "Player" in df.columns:
+                player_set.update(df["Player"].dropna().str.strip().str.title().unique())
+    return PlayerList(sorted([p for p in player_set if p]))
@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+
+FORMATS = ["Test", "ODI", "T20"]
+
+# Source file behind every (category, format) pair
+DATASET_FILES = {
+    "Batting": {"Test": "test.csv", "ODI": "ODI data.csv", "T20": "t20.csv"},
+    "Bowling": {"Test": "Bowling_test.csv", "ODI": "Bowling_ODI.csv", "T20": "Bowling_t20.csv"},
+    "Fielding": {"Test": "Fielding_test.csv", "ODI": "Fielding_ODI.csv", "T20": "Fielding_t20.csv"},
+}
+
+DATASET_FORMATS = {
+    category: {filename: fmt for fmt, filename in files.items()}
+    for category, files in DATASET_FILES.items()
+}
+
+# Stats that still add up when a name appears more than once in a file
+COUNTING_STATS = [
+    "Mat", "Inns", "NO", "Runs", "BF", "100", "50", "0", "4s", "6s",
+    "Balls", "Mdns", "Wkts", "4", "5", "10", "Dis", "Ct", "St", "Ct Wk", "Ct Fi",
+]
+
+
+def dataset_format(category, filename):
+    return DATASET_FORMATS.get(category, {}).get(filename)
+
+
+class PlayerStore:
+    # One row per (player, format) with every category's stats side by side.
+    # Columns are (category, stat) pairs and rows are sorted by player ID, so a
+    # player's whole career is the slice career.iloc[offsets[id]:offsets[id + 1]].
+
+    def __init__(self, players, career, offsets, row_ids):
+        self.players = players
+        self.career = career
+        self.offsets = offsets
+        self.row_ids = row_ids
+        self.ids_by_name = pd.Series(players.index, index=players["Player"])
+        # Plain arrays by ID for handlers, so requests never touch the frame
+        self.names = players["Player"].to_numpy(dtype=object)
+        self.teams = players["Teams"].to_numpy(dtype=object)
+
+    def career_of(self, player_id):
+        return self.career.iloc[self.offsets[player_id]:self.offsets[player_id + 1]]
+
+    def careers_of(self, player_ids):
+        # Several players' careers in one take, in the given order
+        positions = [np.arange(self.offsets[i], self.offsets[i + 1]) for i in player_ids]
+        return self.career.iloc[np.concatenate(positions) if positions else []]
+
+    def ids_for_rows(self, *matches):
+        # Player IDs behind name index hits, in the order the rows are met
+        ids = []
+        for key, row_ids in self.row_ids.items():
+            for file_matches in matches:
+                positions = file_matches.get(key)
+                if positions is not None:
+                    ids.extend(row_ids[positions].tolist())
+        return [i for i in dict.fromkeys(ids) if i >= 0]
+
+
+def played(rows, category):
+    return (category, "Mat") in rows.columns and rows[(category, "Mat")].notna().any()
+
+
+def positive(rows, category, stat):
+    # Stat per format with missing and non-positive values counted as 0
+    if (category, stat) not in rows.columns:
+        return pd.Series(0, index=rows.index)
+    col = rows[(category, stat)]
+    return col.where(col > 0, 0).fillna(0)
+
+
+def positive_total(rows, category, stat):
+    return int(positive(rows, category, stat).sum())
+
+
+def build_player_store(datasets):
+    files = [
+        (category, filename, df)
+        for category, category_files in datasets.items()
+        for filename, df in category_files.items()
+        if "Player" in df.columns and dataset_format(category, filename)
+    ]
+
+    names = sorted({p for _, _, df in files for p in df["Player"].dropna()})
+    ids_by_name = {name: i for i, name in enumerate(names)}
+
+    row_ids = {
+        (category, filename): df["Player"].map(ids_by_name).fillna(-1).to_numpy(dtype=np.intp)
+        for category, filename, df in files
+    }
+
+    # Teams and career length come from the first row a player appears in
+    first_seen = pd.concat(
+        [df.reindex(columns=["Player", "Teams", "CareerLength"]) for _, _, df in files], ignore_index=True
+    ).drop_duplicates("Player").set_index("Player").reindex(names)
+
+    players = pd.DataFrame({
+        "Player": names,
+        "Teams": first_seen["Teams"].tolist(),
+        "CareerLength": pd.array(first_seen["CareerLength"], dtype="Int64"),
+    })
+
+    sections = []
+    for category in DATASET_FILES:
+        frames = []
+        for cat, filename, df in files:
+            if cat != category:
+                continue
+            frame = df.drop(columns=["CareerLength"], errors="ignore")
+            frame.insert(0, "Format", dataset_format(cat, filename))
+            frames.append(frame)
+        if not frames:
+            continue
+
+        section = pd.concat(frames, ignore_index=True)
+        stats = [col for col in section.columns if col not in ("Player", "Format")]
+        grouped = section.groupby(["Player", "Format"], sort=False)
+        counting = [col for col in stats if col in COUNTING_STATS]
+        section = pd.concat([
+            grouped[counting].sum(min_count=1),
+            grouped[[col for col in stats if col not in COUNTING_STATS]].first(),
+        ], axis=1)[stats]
+        section.columns = pd.MultiIndex.from_product([[category], section.columns])
+        sections.append(section)
+
+    career = pd.concat(sections, axis=1, join="outer")
+    player_ids = career.index.get_level_values("Player").map(ids_by_name).to_numpy(dtype=np.intp)
+    formats = career.index.get_level_values("Format")
+    order = np.lexsort((formats.map(FORMATS.index).to_numpy(), player_ids))
+    career = career.iloc[order]
+    career.index = pd.MultiIndex.from_arrays([player_ids[order], formats[order]], names=["player_id", "Format"])
+
+    offsets = np.searchsorted(player_ids[order], np.arange(len(names) + 1))
+
+    return PlayerStore(players, career, offsets, row_ids)
+
+
+# Career totals per player: (column, category, stat)
+TOTAL_STATS = [
+    ("runs", "Batting", "Runs"), ("fours", "Batting", "4s"), ("sixes", "Batting", "6s"), ("innings", "Batting", "Inns"),
+    ("wickets", "Bowling", "Wkts"), ("four_wkts", "Bowling", "4"), ("five_wkts", "Bowling", "5"), ("ten_wkts", "Bowling", "10"),
+    ("dismissals", "Fielding", "Dis"), ("catches", "Fielding", "Ct"), ("stumpings", "Fielding", "St"),
+]
+
+
+def summary_role(t):
+    # Role wording of /analyze summaries; first matching rule wins
+    runs, wickets = t["runs"], t["wickets"]
+    return np.select(
+        [(runs > 1000) & (wickets < 50), (wickets > 100) & (runs < 1000), (runs > 1000) & (wickets > 50)],
+        ["batsman", "bowler", "allrounder"],
+        None,
+    )
+
+
+def role(t):
+    # Role tag of /tags; first matching rule wins
+    runs, wickets = t["runs"], t["wickets"]
+    return np.select(
+        [t["stumpings"] > 1, (runs > 1000) & (wickets >= 50), runs > 1000, wickets >= 100],
+        ["wk", "allrounder", "batsman", "bowler"],
+        None,
+    )
+
+
+def build_player_totals(store):
+    # One row per player ID: cross-format totals, a score per format
+    # (runs + 20 x wickets + 10 x dismissals), the best format and roles
+    career = store.career
+    player_ids = pd.RangeIndex(len(store.players))
+    by_player = career.index.get_level_values("player_id")
+
+    totals = pd.DataFrame({
+        name: positive(career, category, stat).groupby(by_player).sum().reindex(player_ids, fill_value=0).astype("int64")
+        for name, category, stat in TOTAL_STATS
+    }, index=player_ids)
+
+    fielded = career[("Fielding", "Mat")].notna() if ("Fielding", "Mat") in career.columns else pd.Series(False, index=career.index)
+    totals["fielded"] = fielded.groupby(by_player).any().reindex(player_ids, fill_value=False).astype(bool)
+
+    scores = (positive(career, "Batting", "Runs")
+              + positive(career, "Bowling", "Wkts") * 20
+              + positive(career, "Fielding", "Dis") * 10).astype("int64")
+    per_format = scores.unstack("Format").reindex(index=player_ids, columns=FORMATS).fillna(0).astype("int64")
+    for fmt in FORMATS:
+        totals[f"score_{fmt}"] = per_format[fmt]
+    # First format wins ties, as max() over the formats in order did
+    totals["best_format"] = per_format.idxmax(axis=1)
+
+    totals["summary_role"] = summary_role(totals)
+    totals["role"] = role(totals)
+    return totals
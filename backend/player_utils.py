@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from key_groups import KeyGroups
+
+# Keys every player is indexed under, matching the search rules of the API:
+# "sachin tendulkar" / "s tendulkar" (query with a space), "tendulkar", "s"
+NAME_KEY_KINDS = ["lower_name", "short_code", "surname", "initial"]
+
+
+def player_name_keys(player):
+    if not isinstance(player, str) or not player.strip():
+        return {}
+
+    parts = player.lower().split()
+    keys = {
+        "lower_name": player.lower(),
+        "surname": parts[-1],
+        "initial": player.strip()[0].lower(),
+    }
+    if len(parts) >= 2:
+        keys["short_code"] = f"{parts[0][0]} {parts[-1]}"
+    return keys
+
+
+class NameIndex:
+    # Rows are numbered across all files in load order (`starts` holds each
+    # file's first number); per key kind, each key maps to its row numbers
+
+    def __init__(self, files, starts, kinds):
+        self.files = files
+        self.starts = starts
+        self.kinds = kinds
+
+    def get(self, kind, key):
+        # {(category, filename): row positions}, files in load order
+        rows = self.kinds[kind].find(key)
+        if not len(rows):
+            return {}
+        file_numbers = np.searchsorted(self.starts, rows, side="right") - 1
+        bounds = np.concatenate(([0], np.flatnonzero(np.diff(file_numbers)) + 1, [len(rows)]))
+        return {
+            self.files[file_numbers[a]]: rows[a:b] - self.starts[file_numbers[a]]
+            for a, b in zip(bounds[:-1].tolist(), bounds[1:].tolist())
+        }
+
+
+def build_name_index(datasets):
+    files = []
+    starts = []
+    players = []
+    total = 0
+    for category, category_files in datasets.items():
+        for filename, df in category_files.items():
+            if "Player" not in df.columns:
+                continue
+            files.append((category, filename))
+            starts.append(total)
+            players.append(df["Player"].to_numpy(dtype=object))
+            total += len(df)
+
+    # Keys are worked out once per distinct name; players recur across files
+    codes, names = pd.factorize(np.concatenate(players) if players else np.empty(0, dtype=object))
+    name_keys = [player_name_keys(name) for name in names]
+    kinds = {}
+    for kind in NAME_KEY_KINDS:
+        per_name = np.array([keys.get(kind, "") for keys in name_keys] + [""], dtype=object)
+        # codes of -1 (missing names) pick the trailing ""
+        keys = per_name[codes]
+        rows = np.flatnonzero(keys != "")
+        kinds[kind] = KeyGroups(keys[rows], rows)
+
+    return NameIndex(files, np.asarray(starts, dtype=np.intp), kinds)
+
+
+def find_player_rows(name_index, player_name):
+    # Returns {(category, filename): row positions} for a normalized query
+    query = player_name.strip().lower()
+
+    if " " in query:
+        by_code = name_index.get("short_code", query)
+        by_name = name_index.get("lower_name", query)
+        matches = {}
+        for f in list(by_code) + [f for f in by_name if f not in by_code]:
+            if f in by_code and f in by_name:
+                matches[f] = np.union1d(by_code[f], by_name[f])
+            else:
+                matches[f] = by_code.get(f, by_name.get(f))
+        return matches
+    elif len(query) == 1:
+        return name_index.get("initial", query)
+    else:
+        return name_index.get("surname", query)
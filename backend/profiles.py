@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from dataset_schema import DERIVED_COLUMNS
+from serialization import CellMatrix, column_values
+
+
+def zero_cells(series):
+    # Zero stats are hidden from profiles: 0 counts and "0" text like MD
+    if str(series.dtype) == "Int64":
+        return series.eq(0).fillna(False).to_numpy(dtype=bool)
+    if series.dtype == object:
+        return series.isin(["0"]).to_numpy(dtype=bool)
+    return None
+
+
+def build_profile_tables(datasets, reuse=None):
+    # Per dataset: the profile columns, their JSON-ready cell values with zero
+    # stats already nulled, and a row x column mask of the non-empty cells.
+    # Tables in `reuse` belong to files that did not change and are kept as is.
+    reuse = reuse or {}
+    tables = {}
+    for category, files in datasets.items():
+        for filename, df in files.items():
+            if (category, filename) in reuse:
+                tables[(category, filename)] = reuse[(category, filename)]
+                continue
+            columns = [c for c in df.columns if c not in DERIVED_COLUMNS]
+            cells = []
+            for col in columns:
+                values = column_values(df[col])
+                zeros = zero_cells(df[col])
+                if zeros is not None:
+                    values[zeros] = None
+                cells.append(values)
+            values = CellMatrix(len(df), cells)
+            tables[(category, filename)] = (columns, values, values.codes != 0)
+    return tables
+
+
+def profile_records(table, positions):
+    # Matched rows as records, without the columns that are empty or zero for all of them
+    columns, values, nonzero = table
+    keep = np.flatnonzero(nonzero[positions].any(axis=0))
+    names = [columns[j] for j in keep]
+    return [dict(zip(names, row)) for row in values[np.ix_(positions, keep)].tolist()]
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Response
+
+from compression import COMPRESS_MIN_BYTES, negotiate
+from compute_pool import compute_pool, single_flight
+from instrumentation import request_metrics, server_timing
+
+# Encoded JSON bodies of read endpoints, keyed on (dataset version, endpoint,
+# normalized params), with their gzip/br copies beside them once a client
+# asked for one. Entries are dropped least-recently-used first once the
+# bodies exceed CRICKSTATX_RESPONSE_CACHE_MB, and all of them when the
+# datasets are reloaded.
+CACHE_BYTES = int(float(os.environ.get("CRICKSTATX_RESPONSE_CACHE_MB", "64")) * (1 << 20))
+
+# Browsers revalidate every time by default, which costs a 304 while the
+# dataset version is unchanged
+CACHE_MAX_AGE = int(os.environ.get("CRICKSTATX_CACHE_MAX_AGE", "0"))
+CACHE_CONTROL = f"public, max-age={CACHE_MAX_AGE}" if CACHE_MAX_AGE else "public, no-cache"
+
+
+class ResponseCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def etag(self, version, key):
+        # Weak: bodies are equivalent, not byte-identical, across workers
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+        return f'W/"{version}-{digest}"'
+
+    def get(self, key):
+        # {content encoding, None for the plain body: bytes}
+        with self.lock:
+            variants = self.entries.get(key)
+            if variants is not None:
+                self.entries.move_to_end(key)
+            return variants
+
+    def put(self, key, body):
+        variants = {None: body}
+        if len(body) > self.max_bytes:
+            return variants
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= sum(map(len, old.values()))
+            self.entries[key] = variants
+            self.size += len(body)
+            self.evict()
+        return variants
+
+    def put_encoded(self, key, encoding, data):
+        # Keeps a compressed copy beside a cached body, so each version of a
+        # response is compressed once per encoding
+        with self.lock:
+            variants = self.entries.get(key)
+            if variants is None or encoding in variants:
+                return
+            variants[encoding] = data
+            self.size += len(data)
+            self.evict()
+
+    def evict(self):
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= sum(map(len, evicted.values()))
+
+
+response_cache = ResponseCache(CACHE_BYTES)
+
+
+def if_none_match(request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    # Weak comparison, as required for If-None-Match
+    return "*" in tags or etag.removeprefix("W/") in [t.removeprefix("W/") for t in tags]
+
+
+def conditional(request, version, key):
+    # (validator headers, 304 response or None) for one dataset version
+    etag = response_cache.etag(version, key)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if if_none_match(request, etag):
+        return headers, Response(status_code=304, headers=headers)
+    return headers, None
+
+
+async def cached_response(request, state, endpoint, params, compute, *args):
+    # Serves compute(state, *args)'s body from the cache; 304 when the client
+    # already has it. Misses are computed in the compute pool, once for all
+    # identical requests in flight. The entry is keyed on the version of
+    # `state`, so a request that straddles a reload can't cache old data
+    # under the new one.
+    key = (state.version, endpoint, params)
+    headers, not_modified = conditional(request, state.version, (endpoint, params))
+    if not_modified:
+        return not_modified
+
+    start = time.perf_counter()
+    variants = response_cache.get(key)
+    timings = {"cache": time.perf_counter() - start}
+    hit = variants is not None
+    if hit:
+        body = variants[None]
+    else:
+        body, computed = await single_flight.do(key, lambda: compute_pool.run(state, compute, args))
+        timings.update(computed)
+        variants = response_cache.put(key, body)
+
+    encoding = negotiate(request.headers.get("accept-encoding")) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding:
+        data = variants.get(encoding)
+        if data is None:
+            start = time.perf_counter()
+            data = await single_flight.do(key + (encoding,), lambda: compute_pool.compress(body, encoding))
+            timings["compress"] = time.perf_counter() - start
+            response_cache.put_encoded(key, encoding, data)
+        headers["Content-Encoding"] = encoding
+        body = data
+
+    request_metrics.observe_phases(route_of(request), timings)
+    headers["Server-Timing"] = server_timing(timings, "hit" if hit else "miss")
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def route_of(request):
+    # Path template of the matched route, so metrics don't grow per query
+    route = request.scope.get("route")
+    return route.path if route is not None else "unmatched"
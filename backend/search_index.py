@@ -0,0 +1,189 @@
+import re
+
+import numpy as np
+
+from key_groups import EMPTY, KeyGroups
+
+# Typeahead for /search. Players are numbered by popularity rank (0 = most
+# matches played), so every sorted rank array below is already in the order
+# suggestions should be shown.
+
+# Minimum Dice similarity of two words' trigrams for a typo match
+FUZZY_THRESHOLD = 0.6
+# Typo matching only kicks in once a word is this long, on both sides: a
+# two-letter initial ("sa") shares half its trigrams with any query it starts
+FUZZY_MIN_LENGTH = 3
+# Single-letter typos are also caught through deletions (see deletes()),
+# which handles swapped letters ("ponitng") that break most trigrams
+
+_WORD_SPLIT = re.compile(r"[\s\-']+")
+
+
+def name_words(name):
+    # "AB de Villiers" -> ab, de, villiers; "Inzamam-ul-Haq" also -> inzamam-ul-haq
+    lower = name.lower()
+    words = set(lower.split())
+    words.update(w for w in _WORD_SPLIT.split(lower) if w)
+    return words
+
+
+def trigrams(word):
+    # Start-padded only, so a partly typed word still shares its trigrams
+    padded = f"  {word}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def deletes(word):
+    # The word with any one letter removed: two words within one insertion,
+    # deletion, substitution or swap of each other share one of these
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _intersect(arrays):
+    result = arrays[0]
+    for other in arrays[1:]:
+        result = np.intersect1d(result, other, assume_unique=True)
+    return result
+
+
+class SearchIndex:
+    def __init__(self, players, popularity, team_aliases):
+        # players: DataFrame indexed by player ID with Player and Teams
+        order = np.lexsort((players.index.to_numpy(), -popularity.reindex(players.index).fillna(0).to_numpy()))
+        self.names = players["Player"].to_numpy()[order]
+        self.teams = players["Teams"].to_numpy()[order]
+
+        # Normalized full names and name words -> ranks; prefix lookups are
+        # binary searches over the sorted keys
+        full_names, full_ranks, words, word_ranks = [], [], [], []
+        for rank, name in enumerate(self.names):
+            if not isinstance(name, str):
+                continue
+            full_names.append(" ".join(name.lower().split()))
+            full_ranks.append(rank)
+            for word in name_words(name):
+                words.append(word)
+                word_ranks.append(rank)
+        self.full_names = KeyGroups(full_names, full_ranks)
+        self.words = KeyGroups(words, word_ranks)
+
+        # Vocabulary word numbers are positions in self.words.keys
+        self.vocabulary = self.words.keys.tolist()
+        self.word_grams = np.array([len(trigrams(w)) for w in self.vocabulary])
+        gram_keys, gram_words, delete_keys, delete_words = [], [], [], []
+        for number, word in enumerate(self.vocabulary):
+            if len(word) < FUZZY_MIN_LENGTH:
+                continue
+            for gram in trigrams(word):
+                gram_keys.append(gram)
+                gram_words.append(number)
+            if len(word) > FUZZY_MIN_LENGTH:
+                for key in deletes(word) | {word}:
+                    delete_keys.append(key)
+                    delete_words.append(number)
+        # Trigram -> vocabulary word numbers, for typo-tolerant word lookups
+        self.grams = KeyGroups(gram_keys, gram_words)
+        self.word_deletes = KeyGroups(delete_keys, delete_words)
+
+        # Lowercase alias / team name / team word -> canonical team name
+        self.team_keys = {}
+        for alias, team in team_aliases.items():
+            self.team_keys.setdefault(alias.lower(), team)
+        for team in sorted(set(team_aliases.values())):
+            self.team_keys.setdefault(team.lower(), team)
+            for word in team.lower().split():
+                self.team_keys.setdefault(word, team)
+
+    def fuzzy_word(self, word):
+        # Best trigram similarity of any vocabulary word per player rank
+        query = trigrams(word)
+        hits = [h for h in (self.grams.find(g) for g in query) if len(h)]
+        if not hits:
+            return EMPTY, np.empty(0)
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.vocabulary))
+        dice = 2 * shared / (len(query) + self.word_grams)
+        one_typo = [h for h in (self.word_deletes.find(key) for key in deletes(word) | {word}) if len(h)]
+        if one_typo:
+            one_typo = np.concatenate(one_typo)
+            dice[one_typo] = np.maximum(dice[one_typo], FUZZY_THRESHOLD)
+        close = np.flatnonzero(dice >= FUZZY_THRESHOLD)
+        if not len(close):
+            return EMPTY, np.empty(0)
+        groups = [self.words.group(n) for n in close]
+        ranks = np.concatenate(groups)
+        scores = np.concatenate([np.full(len(g), dice[n]) for g, n in zip(groups, close)])
+        best = np.zeros(len(self.names))
+        np.maximum.at(best, ranks, scores)
+        matched = np.flatnonzero(best)
+        return matched, best[matched]
+
+    def fuzzy(self, words):
+        # Players whose names hold a close match for every query word,
+        # best average similarity first. Words too short for typo matching
+        # still have to prefix one of the name's words.
+        total = None
+        for word in words:
+            if len(word) < FUZZY_MIN_LENGTH:
+                ranks = np.unique(self.words.prefixed(word))
+                scores = np.ones(len(ranks))
+            else:
+                ranks, scores = self.fuzzy_word(word)
+            word_score = np.zeros(len(self.names))
+            word_score[ranks] = scores
+            if total is None:
+                total = word_score
+            else:
+                total = np.where((total > 0) & (word_score > 0), total + word_score, 0)
+        matched = np.flatnonzero(total)
+        return matched[np.lexsort((matched, -total[matched]))]
+
+    def search_teams(self, query):
+        exact = self.team_keys.get(query)
+        teams = [exact] if exact else []
+        for key, team in sorted(self.team_keys.items()):
+            if key.startswith(query) and team not in teams:
+                teams.append(team)
+        return teams
+
+    def search(self, query, limit):
+        query = " ".join(query.lower().split())
+        words = query.split()
+        if not words:
+            return [], []
+
+        # Exact words, then full-name prefix, then word prefixes, then typos
+        tiers = [
+            _intersect([self.words.find(w) for w in words]),
+            np.unique(self.full_names.prefixed(query)),
+            _intersect([np.unique(self.words.prefixed(w)) for w in words]),
+        ]
+        ranks = []
+        seen = set()
+        for tier in tiers:
+            for rank in tier[:limit].tolist():
+                if rank not in seen:
+                    seen.add(rank)
+                    ranks.append(rank)
+        if len(ranks) < limit and any(len(w) >= FUZZY_MIN_LENGTH for w in words):
+            for rank in self.fuzzy(words)[:limit].tolist():
+                if rank not in seen:
+                    seen.add(rank)
+                    ranks.append(rank)
+        ranks = ranks[:limit]
+
+        players = [
+            {"player": self.names[r], "teams": self.teams[r] if isinstance(self.teams[r], str) else None}
+            for r in ranks
+        ]
+        return players, self.search_teams(query)
+
+
+def popularity(career):
+    # Matches played per player: the most of any category in each format, summed
+    mats = [col for col in career.columns if col[1] == "Mat"]
+    per_format = career[mats].astype("Float64").max(axis=1, skipna=True).fillna(0)
+    return per_format.groupby(level="player_id").sum()
+
+
+def build_search_index(player_store, team_aliases):
+    return SearchIndex(player_store.players, popularity(player_store.career), team_aliases)
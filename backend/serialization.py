@@ -0,0 +1,70 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # stdlib json is slower but writes the same documents
+    orjson = None
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def _default(value):
+    # Types orjson doesn't know: pandas missing values become null
+    if value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return jsonable_encoder(value)
+
+
+def encode_json(body):
+    # Response body as UTF-8 bytes; NaN and <NA> are written as null
+    if orjson is not None:
+        return orjson.dumps(body, default=_default, option=ORJSON_OPTIONS)
+    return json.dumps(
+        body, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+# Decimal places floats are written with, as df.to_json did (the CSVs hold
+# values like 0.33299999999999996)
+FLOAT_DECIMALS = 10
+
+
+def column_values(series):
+    if pd.api.types.is_float_dtype(series.dtype):
+        series = series.round(FLOAT_DECIMALS)
+    return series.to_numpy(dtype=object, na_value=None)
+
+
+
+class CellMatrix:
+    # Rows x columns of JSON-ready cell values, stored as int32 codes into
+    # the distinct values of each column (code 0 is None). The codes are plain
+    # arrays that a snapshot maps and shares between workers; only the
+    # distinct values are Python objects. Indexing returns the selected cells.
+
+    def __init__(self, rows, columns):
+        cells = [None]
+        codes = np.zeros((rows, len(columns)), dtype=np.int32)
+        for j, column in enumerate(columns):
+            column_codes, distinct = pd.factorize(column)
+            codes[:, j] = np.where(column_codes < 0, 0, column_codes + len(cells))
+            cells.extend(distinct.tolist())
+        self.codes = codes
+        self.cells = np.empty(len(cells), dtype=object)
+        self.cells[:] = cells
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, key):
+        return self.cells[self.codes[key]]
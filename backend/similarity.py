@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from player_store import FORMATS
+from stat_ranks import COMPARE_STATS, LOWER_IS_BETTER
+
+
+class SimilarityIndex:
+    # One feature vector per player ID: every compared stat in every format as
+    # a population percentile in (0, 1] (0 when the player has no such stat).
+    # Neighbours are found with one matrix-vector product over all players;
+    # players with no stats in the compared columns are never neighbours.
+
+    def __init__(self, features, vectors):
+        self.features = features
+        self.vectors = vectors
+        self.sq_norms = np.einsum("ij,ij->i", vectors, vectors)
+
+    def columns(self, format=None):
+        if format is None:
+            return slice(None)
+        return np.array([fmt == format for _, fmt, _ in self.features])
+
+    def has_stats(self, player_id, format=None):
+        return bool(self.vectors[player_id, self.columns(format)].any())
+
+    def nearest(self, player_id, k, format=None):
+        # (IDs, distances) of the k closest players with stats, closest first
+        cols = self.columns(format)
+        vectors = self.vectors[:, cols]
+        query = vectors[player_id]
+        if format is None:
+            sq_norms = self.sq_norms
+        else:
+            sq_norms = np.einsum("ij,ij->i", vectors, vectors)
+        distances = sq_norms - 2 * (vectors @ query) + query @ query
+        # Percentiles are positive, so an all-0 vector means no stats at all
+        distances[sq_norms == 0] = np.inf
+        distances[player_id] = np.inf
+        k = min(k, int(np.isfinite(distances).sum()))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.lexsort((nearest, distances[nearest]))]
+        return nearest, np.sqrt(np.maximum(distances[nearest], 0))
+
+    def max_distance(self, format=None):
+        # Distance between the all-0 and all-1 vectors
+        cols = self.columns(format)
+        return np.sqrt(len(self.features) if format is None else int(cols.sum()))
+
+
+def build_similarity_index(player_store):
+    career = player_store.career
+    n_players = len(player_store.players)
+    formats = career.index.get_level_values("Format").to_numpy()
+    ids = career.index.get_level_values("player_id").to_numpy()
+
+    features = []
+    columns = []
+    for category, stats in COMPARE_STATS.items():
+        if (category, "Mat") not in career.columns:
+            continue
+        played = career[(category, "Mat")].notna().to_numpy()
+        for stat in stats:
+            if (category, stat) not in career.columns:
+                continue
+            values = career[(category, stat)].to_numpy(dtype=float, na_value=np.nan)
+            with np.errstate(invalid="ignore"):
+                positive = played & (values > 0)
+            for fmt in FORMATS:
+                valid = positive & (formats == fmt)
+                percentile = pd.Series(values[valid]).rank(pct=True).to_numpy()
+                if (category, stat) in LOWER_IS_BETTER:
+                    # Best economy/average/strike rate -> highest percentile
+                    percentile = 1 - percentile + 1 / max(len(percentile), 1)
+                column = np.zeros(n_players, dtype=np.float32)
+                column[ids[valid]] = percentile
+                features.append((category, fmt, stat))
+                columns.append(column)
+
+    vectors = np.column_stack(columns) if columns else np.zeros((n_players, 0), dtype=np.float32)
+    return SimilarityIndex(features, vectors)
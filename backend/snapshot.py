@@ -0,0 +1,516 @@
+import hashlib
+import json
+import os
+import platform
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: workers may parse concurrently, the rename still wins once
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+# Cleaned, typed datasets are cached as one .npy file per column so later
+# starts (and every other worker) can map them instead of re-parsing and
+# re-typing the CSVs. Numeric columns are read-only views of the mapped files
+# and text columns are mapped codes into one table of distinct strings, so
+# the workers share the page cache's copy of the data rather than each
+# holding their own. The indexes built from it are stored the same way.
+# Set CRICKSTATX_SNAPSHOT_DIR="" to turn the cache off.
+SNAPSHOT_DIR = os.environ.get(
+    "CRICKSTATX_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".snapshot")
+)
+
+def _code_fingerprint():
+    # Snapshots are only reused by the same backend code and libraries: a change
+    # to the parsing, the schemas or any index builder gives a new key
+    digest = hashlib.sha256(f"{platform.python_version()}:{np.__version__}:{pd.__version__}".encode())
+    backend = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(backend)):
+        if name.endswith(".py"):
+            with open(os.path.join(backend, name), "rb") as f:
+                digest.update(name.encode() + f.read())
+    return digest.hexdigest()[:16]
+
+
+CODE_FINGERPRINT = _code_fingerprint()
+
+
+def source_files(base_path, categories):
+    files = []
+    for category in categories:
+        folder = os.path.join(base_path, category)
+        if os.path.isdir(folder):
+            files.extend(f"{category}/{f}" for f in sorted(os.listdir(folder)) if f.endswith(".csv"))
+    return files
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_manifest(base_path, files, previous=None):
+    # mtime/size per file; hashes are only recomputed for files that were touched
+    previous = previous or {}
+    manifest = {}
+    for rel in files:
+        stat = os.stat(os.path.join(base_path, rel))
+        entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+        old = previous.get(rel)
+        if old and old["mtime_ns"] == entry["mtime_ns"] and old["size"] == entry["size"]:
+            entry["sha256"] = old["sha256"]
+        else:
+            entry["sha256"] = file_hash(os.path.join(base_path, rel))
+        manifest[rel] = entry
+    return manifest
+
+
+def snapshot_key(manifest):
+    digest = hashlib.sha256(CODE_FINGERPRINT.encode())
+    for rel in sorted(manifest):
+        digest.update(f"{rel}:{manifest[rel]['sha256']}".encode())
+    return digest.hexdigest()[:16]
+
+
+@contextmanager
+def snapshot_lock():
+    # Serialises snapshot builds so only the first worker parses the CSVs
+    if not SNAPSHOT_DIR or fcntl is None:
+        yield
+        return
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(SNAPSHOT_DIR, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def published_key():
+    # Dataset version of the most recently written snapshot, or None
+    if not SNAPSHOT_DIR:
+        return None
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, "current.json")) as f:
+            return json.load(f).get("key")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+MASKED_DTYPES = ("Int64", "Float64", "boolean")
+
+
+def _code_dtype(count):
+    # Width pandas gives the codes of `count` categories; codes saved at that
+    # width are used as they are, without a copy
+    for dtype in (np.int8, np.int16, np.int32):
+        if count < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _text_values(series):
+    # (strings, missing) of a text column, coded or not
+    missing = np.asarray(series.isna())
+    return np.array(["" if m else str(v) for v, m in zip(series.tolist(), missing)], dtype=str), missing
+
+
+def _is_text(series):
+    return str(series.dtype) not in MASKED_DTYPES
+
+
+def _save_column(folder, name, series, strings):
+    dtype = str(series.dtype)
+    values = series.array
+    if dtype in MASKED_DTYPES:
+        mask = np.asarray(values.isna())
+        data = values.to_numpy(dtype=values.dtype.numpy_dtype, na_value=0 if dtype != "boolean" else False)
+        np.save(os.path.join(folder, f"{name}.mask.npy"), mask)
+    else:
+        # Text is stored as codes into the snapshot's string table; -1 is missing
+        text, missing = _text_values(series)
+        data = np.searchsorted(strings, text).astype(_code_dtype(len(strings)))
+        data[missing] = -1
+        dtype = "text"
+    np.save(os.path.join(folder, f"{name}.npy"), data)
+    return dtype
+
+
+def _load_column(folder, name, dtype, strings):
+    data = np.load(os.path.join(folder, f"{name}.npy"), mmap_mode="r")
+    if dtype == "text":
+        return pd.Categorical.from_codes(data.view(np.ndarray), dtype=strings, validate=False)
+    mask = np.load(os.path.join(folder, f"{name}.mask.npy"), mmap_mode="r")
+    if dtype == "Int64":
+        return pd.arrays.IntegerArray(data, mask)
+    if dtype == "Float64":
+        return pd.arrays.FloatingArray(data, mask)
+    return pd.arrays.BooleanArray(data, mask)
+
+
+def _decoded(values):
+    table = np.asarray(values.categories, dtype=object)
+    decoded = table[np.maximum(values.codes, 0)]
+    decoded[values.codes < 0] = None
+    return decoded
+
+
+def object_columns(datasets):
+    # The datasets with coded text columns turned back into object columns
+    # (None where missing), as the index builders expect them
+    plain = {}
+    for category, files in datasets.items():
+        plain[category] = {}
+        for filename, df in files.items():
+            coded = [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
+            if coded:
+                df = df.assign(**{col: _decoded(df[col].array) for col in coded})
+            plain[category][filename] = df
+    return plain
+
+
+def save_snapshot(datasets, manifest):
+    if not SNAPSHOT_DIR:
+        return
+    key = snapshot_key(manifest)
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    final = os.path.join(SNAPSHOT_DIR, key)
+
+    if not os.path.isdir(final):
+        tmp = tempfile.mkdtemp(prefix=f"{key}.", dir=SNAPSHOT_DIR)
+
+        # One sorted table of every distinct text value across all files
+        texts = [
+            _text_values(df[col])[0]
+            for files in datasets.values() for df in files.values() for col in df.columns if _is_text(df[col])
+        ]
+        strings = np.unique(np.concatenate(texts)) if texts else np.empty(0, dtype=str)
+        np.save(os.path.join(tmp, "strings.npy"), strings)
+
+        layout = {}
+        for category, files in datasets.items():
+            for filename, df in files.items():
+                folder = os.path.join(tmp, f"{len(layout):02d}")
+                os.makedirs(folder)
+                np.save(os.path.join(folder, "index.npy"), df.index.to_numpy(dtype=np.int64))
+                columns = [
+                    [col, _save_column(folder, f"{i:02d}", df[col], strings)]
+                    for i, col in enumerate(df.columns)
+                ]
+                layout[f"{category}/{filename}"] = {"folder": os.path.basename(folder), "columns": columns}
+        _write_json(os.path.join(tmp, "layout.json"), layout)
+        try:
+            os.rename(tmp, final)
+        except OSError:
+            # Another worker published the same snapshot first
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    _write_json(os.path.join(SNAPSHOT_DIR, "current.json"), {"key": key, "files": manifest})
+
+    # Drop snapshots of older CSV versions
+    for entry in os.listdir(SNAPSHOT_DIR):
+        path = os.path.join(SNAPSHOT_DIR, entry)
+        if os.path.isdir(path) and entry != key and "." not in entry:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+# Built indexes are stored beside the snapshot as tree.json, describing the
+# lists, dicts and objects, plus one .npy file per array; arrays load as
+# read-only memory maps. Nothing is unpickled: only the classes the caller
+# names are rebuilt, by setting their attributes.
+
+class IndexWriter:
+    def __init__(self, folder):
+        self.folder = folder
+        self.arrays = {}
+        self.shared = {}
+        self.specs = []
+        # Encoded objects stay referenced so their ids are not reused
+        self.keep = []
+
+    def array(self, values):
+        # Number of the .npy file holding `values`; each array is written once
+        if id(values) not in self.arrays:
+            if values.dtype.kind not in "biufU":
+                raise TypeError(f"Cannot store {values.dtype} arrays")
+            self.keep.append(values)
+            self.arrays[id(values)] = len(self.arrays)
+            np.save(os.path.join(self.folder, f"{self.arrays[id(values)]:04d}.npy"), np.ascontiguousarray(values))
+        return self.arrays[id(values)]
+
+    def share(self, value, encode):
+        # Objects reachable from several places, like the categories of
+        # coded columns, are described once and referenced after that
+        if id(value) not in self.shared:
+            self.keep.append(value)
+            self.shared[id(value)] = len(self.specs)
+            self.specs.append(None)
+            self.specs[self.shared[id(value)]] = encode(value)
+        return {"ref": self.shared[id(value)]}
+
+    def objects(self, values):
+        # Object arrays are stored as codes into their distinct values
+        distinct = {}
+        table = []
+        codes = np.empty(values.size, dtype=np.int32)
+        for i, value in enumerate(values.ravel().tolist()):
+            encoded = None
+            if isinstance(value, float) and value != value:
+                key = ("nan",)
+            elif value is None or isinstance(value, (str, int, float)) and not isinstance(value, np.generic):
+                key = (type(value), value)
+            else:
+                encoded = self.encode(value)
+                key = json.dumps(encoded)
+            if key not in distinct:
+                distinct[key] = len(table)
+                table.append(self.encode(value) if encoded is None else encoded)
+            codes[i] = distinct[key]
+        return {"objects": self.array(codes), "values": table, "shape": list(values.shape)}
+
+    def values(self, values):
+        # Column or index values: numpy, nullable or categorical arrays
+        dtype = values.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            return {"categorical": self.array(np.asarray(values.codes)),
+                    "categories": self.share(dtype.categories, self.index)}
+        if str(dtype) in MASKED_DTYPES:
+            return {
+                "masked": str(dtype),
+                "data": self.array(values.to_numpy(dtype=dtype.numpy_dtype, na_value=dtype.numpy_dtype.type(0))),
+                "mask": self.array(np.asarray(values.isna())),
+            }
+        values = np.asarray(values)
+        if values.dtype == object:
+            return self.objects(values)
+        return {"array": self.array(values)}
+
+    def index(self, index):
+        if isinstance(index, pd.RangeIndex):
+            return {"range": [index.start, index.stop, index.step], "name": self.encode(index.name)}
+        if isinstance(index, pd.MultiIndex):
+            return {
+                "levels": [self.index(level) for level in index.levels],
+                "codes": [self.array(np.asarray(codes)) for codes in index.codes],
+                "names": [self.encode(name) for name in index.names],
+            }
+        return {"index": self.values(index.array), "name": self.encode(index.name)}
+
+    def encode(self, value):
+        if isinstance(value, np.generic):
+            return {"scalar": value.dtype.str, "value": value.item()}
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if value is pd.NA:
+            return {"na": True}
+        if isinstance(value, list):
+            return [self.encode(v) for v in value]
+        if isinstance(value, tuple):
+            return {"tuple": [self.encode(v) for v in value]}
+        if isinstance(value, dict):
+            if all(isinstance(k, str) for k in value):
+                return {"map": {k: self.encode(v) for k, v in value.items()}}
+            return {"dict": [[self.encode(k), self.encode(v)] for k, v in value.items()]}
+        if isinstance(value, np.ndarray):
+            return self.values(value)
+        if isinstance(value, pd.Index):
+            return self.share(value, self.index)
+        if isinstance(value, pd.Series):
+            return {"series": self.values(value.array), "index": self.encode(value.index),
+                    "name": self.encode(value.name)}
+        if isinstance(value, pd.DataFrame):
+            return {
+                "frame": [self.values(value.iloc[:, j].array) for j in range(value.shape[1])],
+                "columns": self.encode(value.columns),
+                "index": self.encode(value.index),
+            }
+        if hasattr(value, "__dict__"):
+            return {"object": type(value).__name__, "fields": self.encode(vars(value))}
+        raise TypeError(f"Cannot store {type(value).__name__} values")
+
+
+class IndexReader:
+    def __init__(self, folder, specs, classes):
+        self.folder = folder
+        self.specs = specs
+        self.classes = {cls.__name__: cls for cls in classes}
+        self.arrays = {}
+        self.shared = {}
+        # One copy of each decoded string: names recur across the indexes
+        self.strings = {}
+
+    def array(self, number):
+        if number not in self.arrays:
+            path = os.path.join(self.folder, f"{int(number):04d}.npy")
+            self.arrays[number] = np.load(path, mmap_mode="r", allow_pickle=False).view(np.ndarray)
+        return self.arrays[number]
+
+    def values(self, spec):
+        if "categorical" in spec:
+            dtype = pd.CategoricalDtype(self.decode(spec["categories"]))
+            return pd.Categorical.from_codes(self.array(spec["categorical"]), dtype=dtype, validate=False)
+        if "masked" in spec:
+            data, mask = self.array(spec["data"]), self.array(spec["mask"])
+            if spec["masked"] == "Int64":
+                return pd.arrays.IntegerArray(data, mask)
+            if spec["masked"] == "Float64":
+                return pd.arrays.FloatingArray(data, mask)
+            return pd.arrays.BooleanArray(data, mask)
+        if "objects" in spec:
+            table = np.empty(len(spec["values"]), dtype=object)
+            for i, value in enumerate(spec["values"]):
+                table[i] = self.decode(value)
+            return table[self.array(spec["objects"])].reshape(spec["shape"])
+        return self.array(spec["array"])
+
+    def index(self, spec):
+        if "range" in spec:
+            return pd.RangeIndex(*spec["range"], name=self.decode(spec["name"]))
+        if "levels" in spec:
+            return pd.MultiIndex(
+                levels=[self.index(level) for level in spec["levels"]],
+                codes=[self.array(codes) for codes in spec["codes"]],
+                names=[self.decode(name) for name in spec["names"]],
+                verify_integrity=False,
+            )
+        values = self.values(spec["index"])
+        return pd.Index(values, dtype=values.dtype, name=self.decode(spec["name"]), copy=False)
+
+    def decode(self, spec):
+        if isinstance(spec, str):
+            return self.strings.setdefault(spec, spec)
+        if not isinstance(spec, (dict, list)):
+            return spec
+        if isinstance(spec, list):
+            return [self.decode(v) for v in spec]
+        if "ref" in spec:
+            number = spec["ref"]
+            if number not in self.shared:
+                self.shared[number] = self.index(self.specs[number])
+            return self.shared[number]
+        if "scalar" in spec:
+            return np.dtype(spec["scalar"]).type(spec["value"])
+        if "na" in spec:
+            return pd.NA
+        if "tuple" in spec:
+            return tuple(self.decode(v) for v in spec["tuple"])
+        if "map" in spec:
+            return {k: self.decode(v) for k, v in spec["map"].items()}
+        if "dict" in spec:
+            return {self.decode(k): self.decode(v) for k, v in spec["dict"]}
+        if "series" in spec:
+            return pd.Series(self.values(spec["series"]), index=self.decode(spec["index"]),
+                             name=self.decode(spec["name"]), copy=False)
+        if "frame" in spec:
+            columns = [self.values(column) for column in spec["frame"]]
+            df = pd.DataFrame(dict(enumerate(columns)), index=self.decode(spec["index"]), copy=False)
+            df.columns = self.decode(spec["columns"])
+            return df
+        if "object" in spec:
+            cls = self.classes.get(spec["object"])
+            if cls is None:
+                raise ValueError(f"Unexpected class {spec['object']}")
+            value = cls.__new__(cls)
+            value.__dict__.update(self.decode(spec["fields"]))
+            return value
+        return self.values(spec)
+
+
+def save_indexes(key, indexes):
+    # Stores the indexes built from snapshot `key` next to its columns
+    if not SNAPSHOT_DIR or not os.path.isdir(os.path.join(SNAPSHOT_DIR, key)):
+        return
+    final = os.path.join(SNAPSHOT_DIR, key, "indexes")
+    if os.path.isdir(final):
+        return
+    tmp = tempfile.mkdtemp(prefix="indexes.", dir=os.path.join(SNAPSHOT_DIR, key))
+    try:
+        writer = IndexWriter(tmp)
+        tree = writer.encode(indexes)
+        _write_json(os.path.join(tmp, "tree.json"), {"tree": tree, "shared": writer.specs})
+        os.rename(tmp, final)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Not caching indexes for {key}: {e}")
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def load_indexes(key, classes):
+    # The indexes stored for snapshot `key`, or None; `classes` are the only
+    # types that may be rebuilt
+    if not SNAPSHOT_DIR:
+        return None
+    folder = os.path.join(SNAPSHOT_DIR, key, "indexes")
+    try:
+        with open(os.path.join(folder, "tree.json")) as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        return None
+    try:
+        return IndexReader(folder, stored["shared"], classes).decode(stored["tree"])
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Ignoring unreadable indexes {key}: {e}")
+        return None
+
+
+def load_snapshot(base_path, categories):
+    # Returns (datasets, manifest); datasets is None when the CSVs must be parsed
+    files = source_files(base_path, categories)
+    previous = {}
+    current = {}
+    if SNAPSHOT_DIR:
+        try:
+            with open(os.path.join(SNAPSHOT_DIR, "current.json")) as f:
+                current = json.load(f)
+            previous = current.get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    manifest = source_manifest(base_path, files, previous)
+    key = snapshot_key(manifest)
+    folder = os.path.join(SNAPSHOT_DIR, key) if SNAPSHOT_DIR else None
+    if not folder or not os.path.isdir(folder):
+        return None, manifest
+
+    try:
+        with open(os.path.join(folder, "layout.json")) as f:
+            layout = json.load(f)
+        # Every text column shares this one dtype; only its strings are
+        # Python objects in each process, the codes stay in the mapped files
+        strings = pd.CategoricalDtype(pd.Index(np.load(os.path.join(folder, "strings.npy")).astype(object)))
+        datasets = {category: {} for category in categories}
+        for rel, entry in layout.items():
+            category, filename = rel.split("/", 1)
+            column_folder = os.path.join(folder, entry["folder"])
+            index = np.load(os.path.join(column_folder, "index.npy"), mmap_mode="r").view(np.ndarray)
+            df = pd.DataFrame(
+                {
+                    col: _load_column(column_folder, f"{i:02d}", dtype, strings)
+                    for i, (col, dtype) in enumerate(entry["columns"])
+                },
+                index=pd.Index(index, copy=False),
+                copy=False,
+            )
+            datasets.setdefault(category, {})[filename] = df
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring unreadable snapshot {key}: {e}")
+        return None, manifest
+
+    if previous != manifest:
+        _write_json(os.path.join(SNAPSHOT_DIR, "current.json"), {"key": key, "files": manifest})
+    return datasets, manifest
@@ -0,0 +1,59 @@
+import numpy as np
+
+from player_store import FORMATS
+
+# Stats shown by /compare, per category
+COMPARE_STATS = {
+    "Batting": ["Mat", "Inns", "Runs", "Ave", "SR", "100", "50", "4s", "6s"],
+    "Bowling": ["Mat", "Inns", "Wkts", "Econ", "Ave", "SR", "4", "5", "10"],
+    "Fielding": ["Mat", "Inns", "Dis", "Ct", "St"],
+}
+
+# Bowling rates where the smaller number is the better one
+LOWER_IS_BETTER = {("Bowling", "Econ"), ("Bowling", "Ave"), ("Bowling", "SR")}
+
+# (minimum percentile, band)
+PERCENTILE_BANDS = [
+    (99, "top 1%"), (95, "top 5%"), (90, "top 10%"), (75, "top 25%"), (50, "top half"), (0, "bottom half"),
+]
+
+
+def build_stat_populations(career):
+    # {(category, format, stat): sorted positive values of everyone who played
+    # that format}, so a rank is two binary searches
+    formats = career.index.get_level_values("Format").to_numpy()
+    populations = {}
+    for category, stats in COMPARE_STATS.items():
+        if (category, "Mat") not in career.columns:
+            continue
+        played = career[(category, "Mat")].notna().to_numpy()
+        for stat in stats:
+            if (category, stat) not in career.columns:
+                continue
+            values = career[(category, stat)].to_numpy(dtype=float, na_value=np.nan)
+            with np.errstate(invalid="ignore"):
+                valid = played & (values > 0)
+            for fmt in FORMATS:
+                populations[(category, fmt, stat)] = np.sort(values[valid & (formats == fmt)])
+    return populations
+
+
+def percentile_band(percentile):
+    for minimum, band in PERCENTILE_BANDS:
+        if percentile >= minimum:
+            return band
+    return PERCENTILE_BANDS[-1][1]
+
+
+def rank_value(population, value, lower_is_better=False):
+    # (rank, percentile): 1 = best in the population; percentile is the share
+    # of players this value is at least as good as
+    n = len(population)
+    if value is None or n == 0:
+        return None, None
+    if lower_is_better:
+        better = int(np.searchsorted(population, value, side="left"))
+    else:
+        better = n - int(np.searchsorted(population, value, side="right"))
+    at_least_as_good_as = n - better
+    return better + 1, round(100 * at_least_as_good_as / n, 1)
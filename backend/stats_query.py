@@ -0,0 +1,336 @@
+import functools
+import re
+
+import numpy as np
+import pandas as pd
+
+from dataset_schema import SCHEMAS
+from filter_index import span_years
+from player_store import DATASET_FILES
+from serialization import column_values
+
+# Ad-hoc queries over one category's per-format table, e.g.
+#   where  Runs > 5000 and SR > 85 and Debut >= 2000
+#   sort   -Ave, Runs
+#   fields Player, Teams, Runs, Ave, SR
+# Columns are matched case-insensitively; names with spaces or leading digits
+# can be written with underscores or in backticks (HS_Runs, `4s`). Text
+# columns support =, != and contains; missing values never match, negated or
+# not: "not Ave > 10" is "Ave <= 10", and skips players without an Ave.
+
+# Derived from Span, available in every category
+VIRTUAL_COLUMNS = {"Debut": "Int64", "Final": "Int64"}
+
+NUMBER_KINDS = ("Int64", "Float64")
+DEFAULT_FIELDS = ["Player", "Teams"]
+
+TOKEN = re.compile(r"""\s*(?:(?P<quoted>"[^"]*"|'[^']*')|`(?P<backtick>[^`]+)`|(?P<op><=|>=|!=|==|=|<|>)"""
+                   r"""|(?P<paren>[()])|(?P<word>[^\s()<>=!'"`]+))""")
+
+
+class QueryError(ValueError):
+    pass
+
+
+def column_types(category):
+    return {**SCHEMAS[category], **VIRTUAL_COLUMNS}
+
+
+def resolve_column(types, name):
+    wanted = name.strip().strip("`").replace("_", " ").lower()
+    for column in types:
+        if column.lower() == wanted:
+            return column
+    raise QueryError(f"Unknown column '{name}'. Choose from {', '.join(types)}")
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise QueryError(f"Cannot read the query at '{text[position:].strip()}'")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "quoted":
+            tokens.append(("string", value[1:-1]))
+        elif kind == "backtick":
+            tokens.append(("name", value))
+        elif kind == "word" and value.lower() in ("and", "or", "not", "contains"):
+            tokens.append((value.lower(), value))
+        else:
+            tokens.append((kind, value))
+    return tokens
+
+
+class Parser:
+    # where := or ; or := and ("or" and)* ; and := not ("and" not)*
+    # not := "not" not | "(" or ")" | column op value
+
+    def __init__(self, types, tokens):
+        self.types = types
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def take(self, kind=None):
+        if self.position >= len(self.tokens):
+            raise QueryError("The query ends too early")
+        token = self.tokens[self.position]
+        if kind and token[0] != kind:
+            raise QueryError(f"Expected {kind} but found '{token[1]}'")
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self.either()
+        if self.position < len(self.tokens):
+            raise QueryError(f"Unexpected '{self.tokens[self.position][1]}'")
+        return node
+
+    def either(self):
+        node = self.both()
+        while self.peek() == "or":
+            self.take()
+            node = ("or", node, self.both())
+        return node
+
+    def both(self):
+        node = self.negation()
+        while self.peek() == "and":
+            self.take()
+            node = ("and", node, self.negation())
+        return node
+
+    def negation(self):
+        if self.peek() == "not":
+            self.take()
+            return ("not", self.negation())
+        if self.peek() == "paren":
+            if self.take()[1] != "(":
+                raise QueryError("Unexpected ')'")
+            node = self.either()
+            if self.take("paren")[1] != ")":
+                raise QueryError("Missing ')'")
+            return node
+        return self.condition()
+
+    def condition(self):
+        kind, name = self.take()
+        if kind not in ("word", "name"):
+            raise QueryError(f"Expected a column but found '{name}'")
+        column = resolve_column(self.types, name)
+        kind, op = self.take()
+        if kind not in ("op", "contains"):
+            raise QueryError(f"Expected a comparison after {column} but found '{op}'")
+        op = "=" if op == "==" else op
+        value_kind, raw = self.take()
+        if value_kind not in ("word", "string"):
+            raise QueryError(f"Expected a value after {column} {op} but found '{raw}'")
+        return ("compare", column, op, self.value(column, op, value_kind, raw))
+
+    def value(self, column, op, kind, raw):
+        dtype = self.types[column]
+        if dtype in NUMBER_KINDS:
+            if op == "contains":
+                raise QueryError(f"{column} is a number; use =, !=, <, <=, > or >=")
+            try:
+                return float(raw)
+            except ValueError:
+                raise QueryError(f"{column} is a number, not '{raw}'")
+        if dtype == "boolean":
+            if op not in ("=", "!=") or raw.lower() not in ("true", "false"):
+                raise QueryError(f"{column} is true or false; use = or !=")
+            return raw.lower() == "true"
+        if op not in ("=", "!=", "contains"):
+            raise QueryError(f"{column} is text; use =, != or contains")
+        return raw.lower()
+
+
+def referenced(node):
+    if node is None:
+        return []
+    if node[0] == "compare":
+        return [node[1]]
+    return [column for child in node[1:] for column in referenced(child)]
+
+
+class QueryPlan:
+    # A parsed, validated query; independent of the loaded data
+
+    def __init__(self, category, where, sort, fields):
+        self.category = category
+        self.where = where
+        self.sort = sort
+        self.fields = fields
+
+
+@functools.lru_cache(maxsize=512)
+def compile_query(category, where, sort, fields):
+    types = column_types(category)
+    condition = Parser(types, tokenize(where)).parse() if where and where.strip() else None
+
+    keys = []
+    for part in (sort or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        descending = part.startswith("-")
+        words = part.lstrip("-+").split()
+        if words and words[-1].lower() in ("asc", "desc"):
+            descending = words.pop().lower() == "desc"
+        keys.append((resolve_column(types, " ".join(words)), descending))
+
+    if fields and fields.strip():
+        columns = [resolve_column(types, f) for f in fields.split(",") if f.strip()]
+        if not columns:
+            raise QueryError("No fields to return")
+    else:
+        columns = DEFAULT_FIELDS + referenced(condition) + [column for column, _ in keys]
+    return QueryPlan(category, condition, keys, list(dict.fromkeys(columns)))
+
+
+class QueryTable:
+    # One per-format table as flat arrays: floats with NaN for numbers,
+    # lower-cased strings plus a missing mask for text
+
+    def __init__(self, category, df, debut, final):
+        self.frame = df.assign(
+            Debut=pd.array(pd.Series(debut).round(), dtype="Int64"),
+            Final=pd.array(pd.Series(final).round(), dtype="Int64"),
+        )
+        self.size = len(df)
+        self.numbers = {}
+        self.texts = {}
+        for column, dtype in column_types(category).items():
+            if column not in self.frame.columns:
+                continue
+            series = self.frame[column]
+            if dtype in NUMBER_KINDS:
+                self.numbers[column] = series.to_numpy(dtype=float, na_value=np.nan)
+            elif dtype == "boolean":
+                missing = series.isna().to_numpy(dtype=bool)
+                self.texts[column] = (series.fillna(False).to_numpy(dtype=bool), missing)
+            else:
+                missing = series.isna().to_numpy(dtype=bool)
+                values = series.astype("string").str.lower().fillna("").to_numpy(dtype=str)
+                self.texts[column] = (values, missing)
+
+    def mask(self, node):
+        return self.truth(node)[0]
+
+    def truth(self, node):
+        # (rows where the condition holds, rows where it fails). A condition
+        # on a missing value does neither, so "not" doesn't match it either
+        kind = node[0]
+        if kind == "and":
+            (holds, fails), (other_holds, other_fails) = self.truth(node[1]), self.truth(node[2])
+            return holds & other_holds, fails | other_fails
+        if kind == "or":
+            (holds, fails), (other_holds, other_fails) = self.truth(node[1]), self.truth(node[2])
+            return holds | other_holds, fails & other_fails
+        if kind == "not":
+            holds, fails = self.truth(node[1])
+            return fails, holds
+        holds, present = self.compare(node)
+        return holds, present & ~holds
+
+    def compare(self, node):
+        # (rows that match, rows with a value to compare)
+        _, column, op, value = node
+        if column in self.numbers:
+            values = self.numbers[column]
+            present = ~np.isnan(values)
+            with np.errstate(invalid="ignore"):
+                if op == "=":
+                    return values == value, present
+                if op == "!=":
+                    return present & (values != value), present
+                if op == "<":
+                    return values < value, present
+                if op == "<=":
+                    return values <= value, present
+                if op == ">":
+                    return values > value, present
+                return values >= value, present
+        if column in self.texts:
+            values, missing = self.texts[column]
+            if op == "contains":
+                return (np.char.find(values, value) >= 0) & ~missing, ~missing
+            matches = values == value
+            return ~missing & (matches if op == "=" else ~matches), ~missing
+        # Column absent from this format's file: nothing matches
+        nothing = np.zeros(self.size, dtype=bool)
+        return nothing, nothing
+
+    def sort_key(self, column, descending):
+        # Ascending key with missing values last either way
+        if column in self.numbers:
+            values = self.numbers[column]
+            key = -values if descending else values.copy()
+            key[np.isnan(key)] = np.inf
+            return key
+        if column in self.texts:
+            values, missing = self.texts[column]
+            codes = np.unique(values, return_inverse=True)[1].astype(float)
+            key = -codes if descending else codes
+            key[missing] = np.inf
+            return key
+        return np.zeros(self.size)
+
+    def select(self, plan, count=None):
+        # (number of matches, matching rows in order); with `count` only the
+        # first `count` of them are returned
+        rows = np.flatnonzero(self.mask(plan.where)) if plan.where is not None else np.arange(self.size)
+        total = len(rows)
+
+        if plan.sort:
+            keys = [self.sort_key(column, descending)[rows] for column, descending in plan.sort]
+            if len(keys) == 1 and count is not None and 0 < count < total:
+                # Top-k: everything up to the k-th key, ties included, then a
+                # stable sort of just those rows
+                key = keys[0]
+                kth = np.partition(key, count - 1)[count - 1]
+                candidates = np.flatnonzero(key <= kth)
+                order = candidates[np.lexsort((candidates, key[candidates]))]
+            else:
+                order = np.lexsort([np.arange(len(rows))] + keys[::-1])
+            rows = rows[order]
+        return total, rows[:count]
+
+    def values(self, fields, rows):
+        # One JSON-ready value array per field; None for columns this format lacks
+        return [
+            column_values(self.frame[c].iloc[rows]) if c in self.frame.columns else [None] * len(rows)
+            for c in fields
+        ]
+
+    def run(self, plan, limit, offset):
+        total, rows = self.select(plan, offset + limit)
+        values = self.values(plan.fields, rows[offset:])
+        return total, [dict(zip(plan.fields, row)) for row in zip(*values)]
+
+
+def build_query_tables(datasets, filter_index):
+    # {(category, format): QueryTable}; span years come from the filter index
+    # when it has them
+    tables = {}
+    for category, files in DATASET_FILES.items():
+        for fmt, filename in files.items():
+            df = datasets.get(category, {}).get(filename)
+            if df is None:
+                continue
+            entry = filter_index.get((category, filename))
+            if entry is not None:
+                debut, final = entry["start"], entry["end"]
+            elif "Span" in df.columns:
+                debut, final = span_years(df["Span"])
+            else:
+                debut = final = np.full(len(df), np.nan)
+            tables[(category, fmt)] = QueryTable(category, df, debut, final)
+    return tables
@@ -0,0 +1,108 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Concurrency stress run for the read endpoints: every request is answered
+# once serially, then replayed from many threads at once. Each concurrent
+# answer must match its serial one byte for byte, and the requests/second per
+# thread count show whether handlers scale or serialise on shared state.
+#
+#   python stress.py                      # in-process, response cache off
+#   python stress.py --url http://localhost:8000 --threads 1 4 16
+
+REQUESTS = [
+    ("/players", {"prefix": "sa", "limit": 50}),
+    ("/search", {"q": "tendulkr"}),
+    ("/search", {"q": "sha"}),
+    ("/player-profile", {"player_name": "sr tendulkar"}),
+    ("/player-profile", {"player_name": "s"}),
+    ("/analyze", {"player_name": "ms dhoni"}),
+    ("/analyze", {"player_name": "k"}),
+    ("/tags", {"player_name": "smith"}),
+    ("/tags", {"player_name": "r"}),
+    ("/player-batch", {"names": "kohli,jh kallis,warne"}),
+    ("/compare", {"players": "sr tendulkar,rt ponting,bc lara"}),
+    ("/compare", {"players": "ms dhoni,ac gilchrist"}),
+    ("/similar", {"player_name": "jh kallis", "k": 20}),
+    ("/top-performers", {"format": "odi", "role": "allrounder", "limit": 50}),
+    ("/player-filter", {"team": "india", "sort_by": "runs", "era": "2000s"}),
+    ("/player-filter", {"team": "australia", "format": "test"}),
+]
+
+
+def in_process_client():
+    # Recompute every response so the handlers, not the cache, are measured
+    os.environ.setdefault("CRICKSTATX_RESPONSE_CACHE_MB", "0")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from fastapi.testclient import TestClient
+    import main
+
+    local = threading.local()
+
+    def get(path, params):
+        # One client per thread, like separate browser connections
+        if not hasattr(local, "client"):
+            local.client = TestClient(main.app)
+        response = local.client.get(path, params=params)
+        return response.status_code, response.content
+
+    return get
+
+
+def http_client(base_url):
+    import httpx
+
+    local = threading.local()
+
+    def get(path, params):
+        if not hasattr(local, "client"):
+            local.client = httpx.Client(base_url=base_url, timeout=60)
+        response = local.client.get(path, params=params)
+        return response.status_code, response.content
+
+    return get
+
+
+def run(get, threads, rounds, expected):
+    jobs = [i for _ in range(rounds) for i in range(len(REQUESTS))]
+    mismatches = []
+
+    def call(i):
+        path, params = REQUESTS[i]
+        if get(path, params) != expected[i]:
+            mismatches.append((path, params))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(call, jobs))
+    return len(jobs) / (time.perf_counter() - start), mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="Server to load; default runs the app in-process")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--rounds", type=int, default=20, help="Times every request is replayed per thread count")
+    args = parser.parse_args()
+
+    get = http_client(args.url) if args.url else in_process_client()
+    expected = [get(path, params) for path, params in REQUESTS]
+    failed = [(path, status) for (path, _), (status, _) in zip(REQUESTS, expected) if status != 200]
+    if failed:
+        sys.exit(f"Serial requests failed: {failed}")
+
+    ok = True
+    for threads in args.threads:
+        rate, mismatches = run(get, threads, args.rounds, expected)
+        print(f"{threads:>3} threads: {rate:8.1f} req/s, {len(mismatches)} mismatched responses")
+        for path, params in mismatches[:5]:
+            print(f"      {path} {params}")
+        ok = ok and not mismatches
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import pytest
+
+from player_list import PlayerList, decode_cursor, encode_cursor
+
+NAMES = ["Aamer Sohail", "Ab De Villiers", "Abdul Qadir", "Bj Watling", "Ms Dhoni", "Sr Tendulkar", "Çağrı Öz"]
+
+
+def pages(players, prefix=None, limit=None):
+    # Every page of a listing, following next cursors
+    result, cursor = [], None
+    while True:
+        names, cursor = players.select(prefix, cursor, limit)
+        result.append(names)
+        if cursor is None:
+            return result
+
+
+def test_cursor_round_trip():
+    for name in NAMES:
+        assert decode_cursor(encode_cursor(name)) == name
+    assert "=" not in encode_cursor("Ab")
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        PlayerList(NAMES).select(cursor="not base64!")
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 6, 7, 50])
+def test_pages_cover_every_name_once(limit):
+    result = pages(PlayerList(NAMES), limit=limit)
+    assert [name for page in result for name in page] == NAMES
+    assert all(len(page) == limit for page in result[:-1])
+    assert 0 < len(result[-1]) <= limit
+
+
+def test_prefix_pages():
+    players = PlayerList(NAMES)
+    assert pages(players, prefix="ab", limit=1) == [["Ab De Villiers"], ["Abdul Qadir"]]
+    assert pages(players, prefix="AA") == [["Aamer Sohail"]]
+    assert players.select("zz") == ([], None)
+
+
+def test_cursor_survives_reload():
+    # A cursor is a name, so it still works when names around it come and go
+    names, cursor = PlayerList(NAMES).select(limit=2)
+    reloaded = PlayerList(["Aaron Finch"] + NAMES[2:])
+    assert reloaded.select(cursor=cursor, limit=2)[0] == ["Abdul Qadir", "Bj Watling"]
+    gone = PlayerList([n for n in NAMES if n != "Ab De Villiers"])
+    assert gone.select(cursor=cursor, limit=2)[0] == ["Abdul Qadir", "Bj Watling"]
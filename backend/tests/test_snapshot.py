@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import snapshot
+from player_list import PlayerList
+from serialization import CellMatrix
+from snapshot import (load_indexes, load_snapshot, object_columns, save_indexes, save_snapshot, snapshot_key,
+                      source_files, source_manifest)
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path / "snapshot"))
+    (tmp_path / "data" / "Batting").mkdir(parents=True)
+    (tmp_path / "data" / "Batting" / "test.csv").write_text("Player,Runs\nA One,10\n")
+    return str(tmp_path / "data")
+
+
+@pytest.fixture
+def datasets():
+    df = pd.DataFrame(
+        {
+            "Player": ["SR Tendulkar", "Çağrı Öz", None],
+            "Teams": ["India", "India", "Turkey"],
+            "Runs": pd.array([15921, None, 0], dtype="Int64"),
+            "Ave": pd.array([53.78, 1.5, None], dtype="Float64"),
+            "HS Not Out": pd.array([True, None, False], dtype="boolean"),
+        },
+        index=[3, 5, 9],
+    )
+    return {"Batting": {"test.csv": df}, "Bowling": {}}
+
+
+def manifest_of(data_dir):
+    return source_manifest(data_dir, source_files(data_dir, ["Batting", "Bowling"]))
+
+
+def test_datasets_round_trip(data_dir, datasets):
+    save_snapshot(datasets, manifest_of(data_dir))
+    loaded, manifest = load_snapshot(data_dir, ["Batting", "Bowling"])
+    assert manifest == manifest_of(data_dir)
+
+    df = loaded["Batting"]["test.csv"]
+    # Text stays coded over the mapped file until asked for as objects
+    assert isinstance(df["Player"].dtype, pd.CategoricalDtype)
+    assert not df["Runs"].array._data.flags.writeable
+    pd.testing.assert_frame_equal(object_columns(loaded)["Batting"]["test.csv"], datasets["Batting"]["test.csv"])
+    assert loaded["Bowling"] == {}
+
+
+def test_changed_csv_is_parsed_again(data_dir, datasets):
+    saved = manifest_of(data_dir)
+    save_snapshot(datasets, saved)
+    with open(f"{data_dir}/Batting/test.csv", "a") as f:
+        f.write("B Two,20\n")
+    loaded, manifest = load_snapshot(data_dir, ["Batting", "Bowling"])
+    assert loaded is None
+    assert snapshot_key(manifest) != snapshot_key(saved)
+
+
+def test_indexes_round_trip(data_dir, datasets):
+    manifest = manifest_of(data_dir)
+    save_snapshot(datasets, manifest)
+    key = snapshot_key(manifest)
+    frame = datasets["Batting"]["test.csv"]
+    indexes = {
+        "players": PlayerList(["Ab De Villiers", "Ms Dhoni"]),
+        "cells": CellMatrix(3, [np.array(["x", None, "x"], dtype=object), np.array([1.5, 2, None], dtype=object)]),
+        "rows": {("Batting", "test.csv"): np.arange(3), ("Bowling", "x"): np.array([], dtype=np.intp)},
+        "frame": frame,
+        "series": frame["Ave"],
+        "scalars": (None, 1, 2.5, "two", np.int64(3), pd.NA),
+    }
+    save_indexes(key, indexes)
+    loaded = load_indexes(key, [PlayerList, CellMatrix])
+
+    assert loaded["players"].names == ["Ab De Villiers", "Ms Dhoni"]
+    np.testing.assert_array_equal(loaded["players"].lower, indexes["players"].lower)
+    assert loaded["cells"][[0, 1, 2]].tolist() == [["x", 1.5], [None, 2], ["x", None]]
+    assert list(loaded["rows"]) == list(indexes["rows"])
+    np.testing.assert_array_equal(loaded["rows"][("Batting", "test.csv")], np.arange(3))
+    pd.testing.assert_frame_equal(loaded["frame"], frame)
+    pd.testing.assert_series_equal(loaded["series"], frame["Ave"])
+    assert loaded["scalars"][:5] == (None, 1, 2.5, "two", 3)
+    assert type(loaded["scalars"][4]) is np.int64 and loaded["scalars"][5] is pd.NA
+
+
+def test_indexes_only_rebuild_listed_classes(data_dir, datasets):
+    manifest = manifest_of(data_dir)
+    save_snapshot(datasets, manifest)
+    key = snapshot_key(manifest)
+    save_indexes(key, {"players": PlayerList(["Ms Dhoni"])})
+    assert load_indexes(key, []) is None
+    assert load_indexes(key, [PlayerList])["players"].names == ["Ms Dhoni"]
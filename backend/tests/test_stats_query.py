@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stats_query import QueryError, QueryTable, compile_query
+
+
+@pytest.fixture
+def table():
+    df = pd.DataFrame({
+        "Player": ["A One", "B Two", "C Three", "D Four", "E Five", "F Six"],
+        "Teams": ["India", "Australia", "India", None, "England", "India"],
+        "Runs": pd.array([5000, 300, 5000, 120, None, 8000], dtype="Int64"),
+        "Ave": pd.array([45.0, 12.5, 50.0, None, 5.0, 45.0], dtype="Float64"),
+    })
+    debut = np.array([1990, 2001, 1995, np.nan, 2010, 2005])
+    return QueryTable("Batting", df, debut, debut + 10)
+
+
+def players(table, where=None, sort=None, count=None):
+    plan = compile_query("Batting", where, sort, "Player")
+    total, rows = table.select(plan, count)
+    return total, table.frame["Player"].iloc[rows].tolist()
+
+
+def test_and_binds_tighter_than_or(table):
+    assert compile_query("Batting", "Runs > 1 or Ave > 2 and Debut > 3", None, None).where == (
+        "or", ("compare", "Runs", ">", 1.0),
+        ("and", ("compare", "Ave", ">", 2.0), ("compare", "Debut", ">", 3.0)),
+    )
+    assert players(table, "Runs > 6000 or Ave > 40 and Teams = australia")[1] == ["F Six"]
+    assert players(table, "(Runs > 6000 or Ave > 40) and Teams = india")[1] == ["A One", "C Three", "F Six"]
+
+
+def test_not_binds_tighter_than_and(table):
+    assert compile_query("Batting", "not Runs > 1 and Ave > 2", None, None).where == (
+        "and", ("not", ("compare", "Runs", ">", 1.0)), ("compare", "Ave", ">", 2.0),
+    )
+
+
+def test_missing_values_never_match(table):
+    # D Four has no Ave and E Five no Runs: neither side of a condition matches them
+    assert players(table, "Ave > 10")[1] == ["A One", "B Two", "C Three", "F Six"]
+    assert players(table, "not Ave > 10")[1] == ["E Five"]
+    assert players(table, "not Ave = 45") == players(table, "Ave != 45")
+    assert players(table, "not (Runs > 1000 or Ave > 10)")[1] == []
+    assert players(table, "not Teams contains ind")[1] == ["B Two", "E Five"]
+
+
+def test_columns_and_values(table):
+    assert players(table, "runs >= 5000 and `Ave` = 45")[1] == ["A One", "F Six"]
+    assert players(table, "Debut >= 2000")[1] == ["B Two", "E Five", "F Six"]
+    assert players(table, "Teams = 'INDIA'")[0] == 3
+
+
+@pytest.mark.parametrize("where, message", [
+    ("Ave > ", "The query ends too early"),
+    ("Avg > 10", "Unknown column 'Avg'"),
+    ("Ave > ten", "Ave is a number, not 'ten'"),
+    ("Teams > india", "Teams is text; use =, != or contains"),
+    ("Ave contains 4", "Ave is a number; use"),
+    ("(Ave > 10", "The query ends too early"),
+    ("Ave > 10)", "Unexpected ')'"),
+    ("Ave > 10 Runs > 5", "Unexpected 'Runs'"),
+    ("Ave ! 10", "Cannot read the query at '! 10'"),
+])
+def test_errors(where, message):
+    with pytest.raises(QueryError, match=message.replace("(", r"\(").replace(")", r"\)")):
+        compile_query("Batting", where, None, None)
+
+
+def test_sort_keeps_missing_last_and_ties_stable(table):
+    assert players(table, sort="-Ave")[1] == ["C Three", "A One", "F Six", "B Two", "E Five", "D Four"]
+    assert players(table, sort="Ave")[1] == ["E Five", "B Two", "A One", "F Six", "C Three", "D Four"]
+    assert players(table, sort="-Runs, Ave")[1] == ["F Six", "A One", "C Three", "B Two", "D Four", "E Five"]
+
+
+@pytest.mark.parametrize("sort", ["-Ave", "Ave", "-Runs", "Teams desc", "Debut"])
+@pytest.mark.parametrize("count", [1, 2, 3, 5])
+def test_top_k_matches_full_sort(table, sort, count):
+    total, everything = players(table, sort=sort)
+    assert players(table, sort=sort, count=count) == (total, everything[:count])